@@ -0,0 +1,67 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from metadata import atomic_write_text
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache of mesh analysis results.
+    Entries are keyed by the SHA-256 of the uploaded bytes (followed by the settings,
+    for results that depend on them), evicted in LRU order
+    once `max_entries` is reached, and persisted to a JSON file so they survive restarts.
+    A file written for another `version` of the analysis output is ignored.
+    """
+    def __init__(self, path, max_entries=512, version=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != self.version:
+            return
+        # The file is written oldest first, so insertion order is the LRU order
+        for key, value in data.get("entries", {}).items():
+            self._entries[key] = value
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        atomic_write_text(self.path, json.dumps({"version": self.version, "entries": self._entries}))
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def put_many(self, entries):
+        """Stores several entries with a single write of the cache file."""
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            self._evict()
+            self._save()
+
+    def __len__(self):
+        return len(self._entries)
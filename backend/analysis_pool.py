@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class PoolSaturated(Exception):
+    """Raised when the number of queued and running jobs reached `max_pending`."""
+
+
+class JobTimeout(Exception):
+    """Raised when a job did not finish within the pool timeout."""
+
+
+class WorkerCrashed(Exception):
+    """Raised when a worker process died (e.g. killed for memory); the workers are restarted."""
+
+
+class AnalysisPool:
+    """
+    Runs CPU-bound mesh jobs in worker processes so they never block the event loop.
+    At most `max_pending` jobs are accepted at once (queued + running); callers get
+    PoolSaturated beyond that and are expected to answer 503 with Retry-After, as for
+    WorkerCrashed when a worker process dies.
+    """
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _get_executor(self):
+        # Created lazily so importing the app does not fork workers
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _replace_executor(self, broken):
+        """
+        Drops an executor whose worker died: it refuses every later job, so the next
+        one starts fresh workers instead.
+        """
+        with self._lock:
+            if self._executor is not broken:
+                return  # Already replaced by a concurrent job
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args):
+        """
+        Submits `fn(*args)` to a worker process and awaits its result.
+        The slot is only released once the worker is actually done, so a timed out
+        job still counts against `max_pending` until it finishes.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PoolSaturated()
+            self._pending += 1
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release(None)
+            self._replace_executor(executor)
+            raise WorkerCrashed()
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise JobTimeout()
+        except BrokenProcessPool:
+            self._replace_executor(executor)
+            raise WorkerCrashed()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
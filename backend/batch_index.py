@@ -0,0 +1,176 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from metadata import update_metadata
+from metrics import FS_SCANS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_batches_updated_at ON batches (updated_at);
+"""
+
+
+def batch_status(total, done):
+    if total > 0 and total == done:
+        return "Completed"
+    if done > 0:
+        return "In Progress"
+    return "Pending"
+
+
+class BatchIndex:
+    """
+    Per-batch summary (item counts, status, last update) kept in the shared SQLite
+    database, so listing batches never re-reads the item sidecars.
+    Both the API and the factory GUI update it when an item changes status, and
+    publish the change to `events` (an EventLog) when one is given.
+    """
+    def __init__(self, db, prod_dir, events=None):
+        self.db = db
+        self.prod_dir = prod_dir
+        self.events = events
+        self.db.conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _to_summary(row):
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "progress": f"{row['done']}/{row['total']}",
+            "total": row["total"],
+            "done": row["done"],
+            "updated_at": row["updated_at"],
+        }
+
+    def _scan(self, batch_id):
+        """Counts items and finished items from the sidecars of one batch."""
+        batch_dir = os.path.join(self.prod_dir, batch_id)
+        total = done = 0
+        FS_SCANS.inc(operation="batch_scan")
+        for name in os.listdir(batch_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(batch_dir, name), "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            total += 1
+            if data.get("status") == "done":
+                done += 1
+        return total, done
+
+    def _upsert(self, conn, batch_id, total, done):
+        conn.execute(
+            "INSERT OR REPLACE INTO batches (id, total, done, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (batch_id, total, done, batch_status(total, done), datetime.now().isoformat()),
+        )
+
+    def add_batch(self, batch_id, total):
+        """Registers a freshly launched batch whose items are all pending."""
+        self._upsert(self.db.conn, batch_id, total, 0)
+
+    def refresh(self, batch_id):
+        """Recomputes one batch summary from its sidecars."""
+        total, done = self._scan(batch_id)
+        self._upsert(self.db.conn, batch_id, total, done)
+
+    def sync(self):
+        """
+        Indexes batch directories the index does not know yet (e.g. batches created
+        before the index existed) and forgets batches whose directory is gone.
+        Only unknown batches are scanned.
+        """
+        if not os.path.isdir(self.prod_dir):
+            return
+        FS_SCANS.inc(operation="batch_sync")
+        on_disk = {d for d in os.listdir(self.prod_dir) if os.path.isdir(os.path.join(self.prod_dir, d))}
+        indexed = {row["id"] for row in self.db.execute("SELECT id FROM batches")}
+        for batch_id in on_disk - indexed:
+            self.refresh(batch_id)
+        for batch_id in indexed - on_disk:
+            self.db.execute("DELETE FROM batches WHERE id = ?", (batch_id,))
+
+    def list_batches(self):
+        """Returns every batch summary, newest batch first."""
+        rows = self.db.execute("SELECT * FROM batches ORDER BY id DESC").fetchall()
+        return [self._to_summary(row) for row in rows]
+
+    def query(self, limit, cursor=None, status=None, date_from=None, date_to=None):
+        """
+        Returns one page of batch summaries, newest first, plus the cursor of the next
+        page (None on the last page). Batch ids start with their launch timestamp, so
+        the cursor and the date range are plain primary key comparisons.
+        """
+        clauses, params = [], []
+        if cursor:
+            clauses.append("id < ?")
+            params.append(cursor)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if date_from:
+            clauses.append("id >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            clauses.append("id < ?")
+            params.append((date_to + timedelta(days=1)).isoformat())
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.execute(
+            f"SELECT * FROM batches {where} ORDER BY id DESC LIMIT ?", (*params, limit + 1)
+        ).fetchall()
+        next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+        return [self._to_summary(row) for row in rows[:limit]], next_cursor
+
+    def changes_since(self, since):
+        """Returns the batches updated after the `since` timestamp, oldest change first."""
+        rows = self.db.execute(
+            "SELECT * FROM batches WHERE updated_at > ? ORDER BY updated_at", (since,)
+        ).fetchall()
+        return [self._to_summary(row) for row in rows]
+
+    def version(self):
+        """Returns (batch count, latest update); changes whenever any summary changes."""
+        row = self.db.execute("SELECT COUNT(*) AS n, MAX(updated_at) AS latest FROM batches").fetchone()
+        return row["n"], row["latest"] or ""
+
+    def get(self, batch_id):
+        row = self.db.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        return self._to_summary(row) if row else None
+
+    def set_item_status(self, json_path, status, expected_version=None, **fields):
+        """
+        Sets the production status of one item sidecar (plus any extra `fields`)
+        and adjusts the done counter of its batch in the same step.
+        The sidecar is rewritten atomically under its lock; with `expected_version`
+        a concurrent change raises metadata.VersionConflict instead of being overwritten.
+        Returns the updated sidecar data.
+        """
+        previous, data = update_metadata(json_path, {**fields, "status": status}, expected_version)
+        was_done = previous.get("status") == "done"
+
+        delta = int(status == "done") - int(was_done)
+        batch_id = os.path.basename(os.path.dirname(json_path))
+        with self.db.transaction() as conn:
+            if delta:
+                row = conn.execute("SELECT total, done FROM batches WHERE id = ?", (batch_id,)).fetchone()
+                if row is None:
+                    total, done = self._scan(batch_id)
+                else:
+                    total, done = row["total"], row["done"] + delta
+                self._upsert(conn, batch_id, total, done)
+            if self.events is not None:
+                self.events.publish(
+                    "batch.item_status",
+                    {"batch_id": batch_id, "item_id": data.get("id"), "status": status, "version": data["version"]},
+                    conn=conn,
+                )
+        return data
@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from cart_store import DEFAULT_CART
+from file_delivery import VARIANT_SUFFIXES
+from metadata import atomic_write_json, atomic_write_text, fsync_dir, lock_path, locked, write_metadata
+from nesting import nest_parts, plates_by_item
+
+# Written without a .json extension so it is never taken for an item sidecar
+JOURNAL_NAME = ".launch-journal"
+MANIFEST_NAME = "PRODUCTION_MANIFEST.txt"
+# Build-plate layout of the batch (JSON, same extension rule as the journal)
+LAYOUT_NAME = "PLATE_LAYOUT"
+
+
+def new_batch_id():
+    """Launch timestamp (batch listings sort and page on it) plus a random suffix against collisions."""
+    return f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def _remove_lock(staging_path):
+    try:
+        os.remove(lock_path(staging_path))
+    except FileNotFoundError:
+        pass
+
+
+class BatchTooLarge(Exception):
+    """The cart holds more copies than one batch may nest."""
+    def __init__(self, copies, max_copies):
+        super().__init__(f"The cart holds {copies} copies, more than the {max_copies} a batch can take")
+        self.copies = copies
+        self.max_copies = max_copies
+
+
+class BatchLauncher:
+    """
+    Moves cart items into a new production batch as one journaled operation.
+
+    The cart rows are first claimed for the batch in one database transaction, so
+    launches from any number of API workers never take the same item twice. The
+    batch is assembled in `staging_dir/<batch_id>` (same filesystem as the
+    production tree) after a journal listing the items has been written there.
+    Sidecars are written (and models stored before the blob store moved) in
+    parallel, then the directory is renamed into `prod_dir`:
+    that rename is the commit point. Claimed rows are only deleted afterwards.
+
+    Each launch holds a lock on its batch id until it is done. `recover()` (run at
+    startup by every worker) skips batches whose lock is held, rolls back staging
+    directories left by a crash, moving the models back and giving the claimed
+    items back to the cart, and finishes committed batches whose journal is still
+    present. A part is therefore always either in the cart or in exactly one batch.
+    """
+    def __init__(self, cart_store, batch_index, prod_dir, staging_dir, workers=8, max_copies=None):
+        self.cart_store = cart_store
+        self.batch_index = batch_index
+        self.prod_dir = prod_dir
+        self.staging_dir = staging_dir
+        self.workers = workers
+        self.max_copies = max_copies
+        os.makedirs(staging_dir, exist_ok=True)
+
+    @staticmethod
+    def _move_item(item, batch_dir):
+        src_stl = item["filepath"]
+        dst_stl = os.path.join(batch_dir, os.path.basename(src_stl))
+        # Items stored as blobs only need their sidecar: the cart's reference becomes the batch's
+        if not item.get("blob"):
+            for suffix in ("",) + VARIANT_SUFFIXES:
+                if os.path.exists(src_stl + suffix):
+                    shutil.move(src_stl + suffix, dst_stl + suffix)
+        write_metadata(dst_stl + ".json", item)
+
+    @staticmethod
+    def _restore_item(item, batch_dir):
+        if item.get("blob"):
+            return
+        src_stl = item["filepath"]
+        staged = os.path.join(batch_dir, os.path.basename(src_stl))
+        for suffix in ("",) + VARIANT_SUFFIXES:
+            if os.path.exists(staged + suffix) and not os.path.exists(src_stl + suffix):
+                shutil.move(staged + suffix, src_stl + suffix)
+
+    def _parallel(self, fn, items, batch_dir):
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items)) or 1) as pool:
+            # list() re-raises the first failure once every move has finished
+            list(pool.map(lambda item: fn(item, batch_dir), items))
+
+    def _rollback(self, batch_id, staging_path, items):
+        self._parallel(self._restore_item, items, staging_path)
+        self.cart_store.release_claim(batch_id)
+        shutil.rmtree(staging_path)
+
+    def _finish(self, batch_id):
+        """Post-commit cleanup; idempotent so recovery can replay it."""
+        self.cart_store.delete_claimed(batch_id)
+        journal = os.path.join(self.prod_dir, batch_id, JOURNAL_NAME)
+        if os.path.exists(journal):
+            os.remove(journal)
+
+    def launch(self, render_manifest, cart_token=DEFAULT_CART, print_estimate=None):
+        """
+        Moves every item of one cart into a new batch and returns (batch id, items),
+        or (None, []) when the cart is empty. Carts holding more than `max_copies` copies
+        raise BatchTooLarge.
+        The parts are nested on build plates first (see nesting.nest_parts): each item
+        records its plate assignments and the full layout is stored with the batch.
+        `print_estimate(item)`, when given, returns the estimate recorded with each item.
+        `render_manifest(batch_id, items, layout)` returns the text of the batch manifest.
+        On failure before the commit the cart is left as it was.
+        """
+        batch_id = new_batch_id()
+        staging_path = os.path.join(self.staging_dir, batch_id)
+        try:
+            with locked(staging_path):
+                return self._launch(batch_id, staging_path, render_manifest, cart_token, print_estimate)
+        finally:
+            _remove_lock(staging_path)
+
+    def _launch(self, batch_id, staging_path, render_manifest, cart_token, print_estimate):
+        # The directory exists before the claim, so recovery never sees a claim without it
+        os.makedirs(staging_path)
+        items = self.cart_store.claim(cart_token, batch_id)
+        if not items:
+            os.rmdir(staging_path)
+            return None, []
+        try:
+            copies = sum(max(int(item.get("quantity", 1)), 1) for item in items)
+            if self.max_copies is not None and copies > self.max_copies:
+                raise BatchTooLarge(copies, self.max_copies)
+            layout = nest_parts(items)
+            assignments = plates_by_item(layout)
+            items = [{**item, "plates": assignments.get(item["id"], [])} for item in items]
+            if print_estimate is not None:
+                for item in items:
+                    item["estimate"] = print_estimate(item)
+
+            atomic_write_text(
+                os.path.join(staging_path, JOURNAL_NAME),
+                json.dumps({"batch_id": batch_id, "items": items}),
+            )
+            self._parallel(self._move_item, items, staging_path)
+            atomic_write_json(os.path.join(staging_path, LAYOUT_NAME), layout, indent=None)
+            atomic_write_text(os.path.join(staging_path, MANIFEST_NAME), render_manifest(batch_id, items, layout))
+            fsync_dir(staging_path)
+            os.rename(staging_path, os.path.join(self.prod_dir, batch_id))
+            fsync_dir(self.prod_dir)
+        except BaseException:
+            self._rollback(batch_id, staging_path, items)
+            raise
+        self.batch_index.add_batch(batch_id, len(items))
+        self._finish(batch_id)
+        return batch_id, items
+
+    def _recover_batch(self, batch_id):
+        """Resolves one interrupted launch; returns "rolled_back", "completed" or None."""
+        staging_path = os.path.join(self.staging_dir, batch_id)
+        journal = os.path.join(self.prod_dir, batch_id, JOURNAL_NAME)
+        if os.path.isdir(staging_path):
+            try:
+                with open(os.path.join(staging_path, JOURNAL_NAME), "r") as f:
+                    items = json.load(f)["items"]
+            except (OSError, ValueError, KeyError):
+                # Crashed before the journal existed: nothing was moved yet
+                items = []
+            self._rollback(batch_id, staging_path, items)
+            return "rolled_back"
+        if os.path.isfile(journal):
+            self.batch_index.refresh(batch_id)
+            self._finish(batch_id)
+            return "completed"
+        if not os.path.isdir(os.path.join(self.prod_dir, batch_id)):
+            # Claimed items with neither a staging nor a batch directory go back to the cart
+            self.cart_store.release_claim(batch_id)
+            return "rolled_back"
+        return None
+
+    def recover(self):
+        """
+        Resolves launches interrupted by a crash, leaving alone those still running in
+        another worker. Returns (rolled back, completed) counts.
+        """
+        candidates = {name for name in os.listdir(self.staging_dir) if not name.startswith(".")}
+        candidates.update(self.cart_store.claims())
+        candidates.update(
+            batch_id for batch_id in os.listdir(self.prod_dir)
+            if os.path.isfile(os.path.join(self.prod_dir, batch_id, JOURNAL_NAME))
+        )
+        counts = {"rolled_back": 0, "completed": 0}
+        for batch_id in sorted(candidates):
+            staging_path = os.path.join(self.staging_dir, batch_id)
+            try:
+                with locked(staging_path, blocking=False):
+                    # Checked under the lock: the launch may have ended since the listing
+                    outcome = self._recover_batch(batch_id)
+            except BlockingIOError:
+                continue
+            if outcome:
+                counts[outcome] += 1
+            _remove_lock(staging_path)
+        return counts["rolled_back"], counts["completed"]
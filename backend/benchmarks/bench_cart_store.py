@@ -0,0 +1,121 @@
+"""
+Compares cart list / update / delete latency between the legacy JSON sidecars
+(glob + json.load per item) and the SQLite cart store.
+
+Usage (from the backend directory):
+    python benchmarks/bench_cart_store.py [size ...]
+
+Default sizes are 10, 1000 and 50000 items.
+"""
+import glob
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cart_store import CartStore  # noqa: E402
+from db import Database  # noqa: E402
+
+SIZES = [10, 1000, 50000]
+OPERATIONS = 20
+
+
+# --- Legacy implementation (JSON sidecars) ---
+
+def legacy_list(cart_dir):
+    items = []
+    for jf in glob.glob(os.path.join(cart_dir, "*.json")):
+        with open(jf, "r") as f:
+            items.append(json.load(f))
+    items.sort(key=lambda x: x.get("added_at", ""), reverse=True)
+    return items
+
+
+def legacy_update(cart_dir, item_id, quantity):
+    target = glob.glob(os.path.join(cart_dir, f"{item_id}_*.json"))[0]
+    with open(target, "r") as f:
+        data = json.load(f)
+    data["quantity"] = quantity
+    with open(target, "w") as f:
+        json.dump(data, f, indent=4)
+
+
+def legacy_delete(cart_dir, item_id):
+    for jf in glob.glob(os.path.join(cart_dir, f"{item_id}_*.json")):
+        os.remove(jf)
+
+
+# --- Fixtures ---
+
+def make_items(count):
+    start = datetime(2024, 1, 1)
+    items = []
+    for i in range(count):
+        item_id = str(uuid.uuid4())
+        items.append({
+            "id": item_id,
+            "filename": f"part_{i}.stl",
+            "filepath": os.path.join("data", "cart", f"{item_id}_part_{i}.stl"),
+            "config": {"tech": "FDM", "material": "PLA", "infill": 20, "price": 4.2, "volume": 12.5},
+            "added_at": (start + timedelta(seconds=i)).isoformat(),
+            "quantity": 1,
+        })
+    return items
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(size, workdir):
+    items = make_items(size)
+    ids = [item["id"] for item in items]
+    targets = random.sample(ids, min(OPERATIONS, size))
+
+    cart_dir = os.path.join(workdir, f"cart_{size}")
+    os.makedirs(cart_dir)
+    for item in items:
+        with open(os.path.join(cart_dir, f"{item['id']}_{item['filename']}.json"), "w") as f:
+            json.dump(item, f, indent=4)
+
+    store = CartStore(Database(os.path.join(workdir, f"store_{size}.db")))
+    with store.db.transaction():
+        for item in items:
+            store.add(item)
+
+    results = {
+        "list": (timed(legacy_list, cart_dir), timed(store.list_items)),
+        "update": (
+            sum(timed(legacy_update, cart_dir, i, 2) for i in targets) / len(targets),
+            sum(timed(store.update_quantity, i, 2) for i in targets) / len(targets),
+        ),
+        "delete": (
+            sum(timed(legacy_delete, cart_dir, i) for i in targets) / len(targets),
+            sum(timed(store.delete, i) for i in targets) / len(targets),
+        ),
+    }
+
+    print(f"{size} items")
+    for op, (legacy_ms, store_ms) in results.items():
+        print(f"   {op:<7} json sidecars {legacy_ms:10.3f} ms   sqlite {store_ms:8.3f} ms")
+
+
+def main(sizes):
+    workdir = tempfile.mkdtemp(prefix="bench_cart_")
+    try:
+        for size in sizes:
+            run(size, workdir)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main([int(s) for s in sys.argv[1:]] or SIZES)
@@ -0,0 +1,309 @@
+"""
+Latency, throughput and peak memory of the main API endpoints, driven in-process
+through the FastAPI test client against synthetic fixtures.
+
+Usage (from the backend directory):
+    python benchmarks/bench_endpoints.py [--scales 10 100 1000] [--high-poly 1000000]
+                                         [--repeats 20] [--output results.json]
+    python benchmarks/bench_endpoints.py --compare base.json new.json
+
+Cases:
+    analyze_file              cube / sphere (binary and ASCII) and high-poly spheres; every
+                              request has a distinct header so it misses the analysis cache,
+                              except the "*_cached" case. The print estimate job the upload
+                              queues is left out (the test client runs it before returning)
+    print_estimate            slicing a stored binary fixture: every request asks /estimate
+                              for a layer height that is not cached yet
+    get_cart                  one cart holding `scale` items
+    list_production_batches   first page with `scale` batches in production
+    launch_production         launching a cart of `scale` items
+
+Each case runs in a fresh process with its own data directory, so peak RSS is
+per case. Peak RSS of the analysis worker processes is reported separately
+(Linux only). Results are written as JSON, with the commit they were measured
+on, for --compare.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+from fixtures import populate_cart, populate_production, stl_fixtures  # noqa: E402
+
+SCALES = [10, 100, 1000]
+HIGH_POLY = [1_000_000]
+REPEATS = 20
+FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "bench_fixtures")
+ITEMS_PER_BATCH = 5
+
+
+# --- Memory ---
+
+def _proc_peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def self_peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def pool_peak_rss_mb(pool):
+    executor = pool._executor
+    if executor is None:
+        return None
+    peaks = [_proc_peak_rss_mb(pid) for pid in list(executor._processes or {})]
+    peaks = [p for p in peaks if p is not None]
+    return max(peaks) if peaks else None
+
+
+# --- Cases (run inside the worker process) ---
+
+def vary(content, ascii_stl, i):
+    """Same mesh, different bytes: rewrites the binary header or the ASCII solid name."""
+    if ascii_stl:
+        newline = content.index(b"\n")
+        return f"solid bench{i}".encode() + content[newline:]
+    return f"bench {i}".encode().ljust(80, b" ") + content[80:]
+
+
+def run_analyze_file(api, client, case, fixture):
+    with open(fixture, "rb") as f:
+        content = f.read()
+    # Background tasks run inside the test client's request; the estimates have their own case
+    api.schedule_estimates = lambda *args, **kwargs: False
+    cached = case.endswith("_cached")
+    ascii_stl = "_ascii" in case
+    # Warm-up request: starts the analysis workers (and fills the cache for the cached case)
+    client.post("/analyze-file", files={"file": ("warmup.stl", vary(content, ascii_stl, -1))})
+
+    def request(i):
+        body = vary(content, ascii_stl, -1 if cached else i)
+        return client.post("/analyze-file", files={"file": ("model.stl", body)})
+    return request, len(content)
+
+
+def run_print_estimate(api, client, fixture):
+    with open(fixture, "rb") as f:
+        content = f.read()
+    file_hash = hashlib.sha256(content).hexdigest()
+    tmp_path = os.path.join(api.TMP_DIR, "bench.stl")
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    api.blob_store.store(tmp_path, file_hash)
+    # Warm-up request: starts the analysis workers
+    client.get(f"/estimate/{file_hash}", params={"layer_height": 0.5})
+
+    def request(i):
+        # A new layer height each time, so the model is sliced again
+        return client.get(f"/estimate/{file_hash}", params={"layer_height": round(0.1 + 0.001 * i, 3)})
+    return request, len(content)
+
+
+def run_get_cart(api, client, scale):
+    token = "benchcart" + "0" * 16
+    populate_cart(api.cart_store, api.cart_dir_for(token), token, scale, with_files=False)
+    return lambda i: client.get("/cart", headers={"X-Cart-Token": token})
+
+
+def run_list_production_batches(api, client, scale):
+    populate_production(api.PROD_DIR, scale, ITEMS_PER_BATCH)
+    api.batch_index.sync()
+    return lambda i: client.get("/admin/batches", params={"limit": 50})
+
+
+def run_launch_production(api, client, scale):
+    def request(i):
+        token = f"benchlaunch{i:08d}" + "0" * 8
+        populate_cart(api.cart_store, api.cart_dir_for(token), token, scale, blob_store=api.blob_store)
+        start = time.perf_counter()
+        response = client.post("/production/launch", headers={"X-Cart-Token": token})
+        return response, time.perf_counter() - start
+    return request
+
+
+def run_worker(spec, result_path):
+    """Runs one case in this process and writes its measurements to `result_path`."""
+    workdir = tempfile.mkdtemp(prefix="bench_endpoints_")
+    os.chdir(workdir)
+    import main as api
+    from fastapi.testclient import TestClient
+
+    endpoint, case, scale, repeats = spec["endpoint"], spec["case"], spec.get("scale"), spec["repeats"]
+    payload_bytes = 0
+    latencies, errors = [], 0
+    try:
+        with TestClient(api.app) as client:
+            if endpoint == "analyze_file":
+                request, payload_bytes = run_analyze_file(api, client, case, spec["fixture"])
+            elif endpoint == "print_estimate":
+                request, payload_bytes = run_print_estimate(api, client, spec["fixture"])
+            else:
+                request = globals()[f"run_{endpoint}"](api, client, scale)
+
+            for i in range(repeats):
+                start = time.perf_counter()
+                outcome = request(i)
+                elapsed = time.perf_counter() - start
+                # Requests with untimed setup return their own timing
+                response, elapsed = outcome if isinstance(outcome, tuple) else (outcome, elapsed)
+                latencies.append(elapsed)
+                if response.status_code >= 400:
+                    errors += 1
+            pool_peak = pool_peak_rss_mb(api.analysis_pool)
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies_ms = np.array(latencies) * 1000
+    result = {
+        **spec,
+        "requests": repeats,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "throughput_rps": round(repeats / sum(latencies), 2),
+        "peak_rss_mb": self_peak_rss_mb(),
+        "pool_peak_rss_mb": pool_peak,
+    }
+    if payload_bytes:
+        result["throughput_mb_s"] = round(payload_bytes * repeats / sum(latencies) / 1e6, 2)
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+# --- Driver ---
+
+def build_specs(fixtures, scales, repeats):
+    few = max(3, repeats // 4)
+    specs = []
+    for name, path in fixtures.items():
+        heavy = name.startswith("sphere_") and name.split("_")[1].isdigit()
+        specs.append({"endpoint": "analyze_file", "case": name, "fixture": path, "repeats": few if heavy else repeats})
+    specs.append({"endpoint": "analyze_file", "case": "sphere_binary_cached",
+                  "fixture": fixtures["sphere_binary"], "repeats": repeats})
+    for name, path in fixtures.items():
+        if name.endswith("_binary"):
+            heavy = name.split("_")[1].isdigit()
+            specs.append({"endpoint": "print_estimate", "case": name, "fixture": path,
+                          "repeats": few if heavy else repeats})
+    for scale in scales:
+        specs.append({"endpoint": "get_cart", "case": f"{scale}_items", "scale": scale, "repeats": repeats})
+        specs.append({"endpoint": "list_production_batches", "case": f"{scale}_batches", "scale": scale,
+                      "repeats": repeats})
+        specs.append({"endpoint": "launch_production", "case": f"{scale}_items", "scale": scale, "repeats": few})
+    return specs
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_mb(value):
+    return f"{value:7.0f}" if value is not None else "      -"
+
+
+def run_suite(args):
+    fixtures = stl_fixtures(args.fixture_dir, args.high_poly)
+    results = []
+    print(f"{'endpoint':<24} {'case':<24} {'p50 ms':>10} {'p95 ms':>10} {'req/s':>9} {'rss MB':>7} {'pool MB':>7}")
+    for spec in build_specs(fixtures, args.scales, args.repeats):
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            result_path = tmp.name
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", json.dumps(spec), result_path],
+                           cwd=BACKEND_DIR, check=True)
+            with open(result_path) as f:
+                result = json.load(f)
+        finally:
+            os.remove(result_path)
+        results.append(result)
+        errors = f"   {result['errors']} errors" if result["errors"] else ""
+        print(f"{result['endpoint']:<24} {result['case']:<24} {result['p50_ms']:10.2f} {result['p95_ms']:10.2f} "
+              f"{result['throughput_rps']:9.1f} {format_mb(result['peak_rss_mb'])} "
+              f"{format_mb(result['pool_peak_rss_mb'])}{errors}")
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    output = args.output or f"bench_endpoints_{report['commit'] or 'unknown'}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+def compare(base_path, new_path):
+    """Prints p50/p95 of two result files side by side, per case."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    base_results = {(r["endpoint"], r["case"]): r for r in base["results"]}
+    print(f"{base.get('commit')} -> {new.get('commit')}")
+    for r in new["results"]:
+        old = base_results.get((r["endpoint"], r["case"]))
+        if old is None:
+            continue
+        print(f"{r['endpoint']:<24} {r['case']:<24} "
+              f"p50 {old['p50_ms']:9.2f} -> {r['p50_ms']:9.2f} ({r['p50_ms'] / old['p50_ms']:5.2f}x)   "
+              f"p95 {old['p95_ms']:9.2f} -> {r['p95_ms']:9.2f} ({r['p95_ms'] / old['p95_ms']:5.2f}x)")
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES)
+    parser.add_argument("--high-poly", type=int, nargs="*", default=HIGH_POLY)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--fixture-dir", default=FIXTURE_DIR)
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(json.loads(args.worker[0]), args.worker[1])
+        return 0
+    if args.compare:
+        return compare(*args.compare)
+    return run_suite(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
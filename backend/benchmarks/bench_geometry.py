@@ -0,0 +1,53 @@
+"""
+Times the full geometry analysis (volume, area, bounding box, shell volume,
+overhangs, edge topology) on an in-memory triangle array and checks it against
+a per-million-triangle time budget.
+
+Usage (from the backend directory):
+    python benchmarks/bench_geometry.py [triangles ...]
+
+Default sizes are 100k, 1M and 4M triangles of a closed sphere. The budget is
+read from GEOMETRY_BUDGET_S_PER_MTRI (seconds per million triangles, default 1.5);
+the script exits with status 1 when any size exceeds it.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import make_sphere  # noqa: E402
+from mesh_analysis import STREAM_CHUNK_FACETS, StlAnalyzer  # noqa: E402
+
+SIZES = [100_000, 1_000_000, 4_000_000]
+REPEATS = 3
+BUDGET_S_PER_MTRI = float(os.environ.get("GEOMETRY_BUDGET_S_PER_MTRI", 1.5))
+
+
+def run(size):
+    vectors = make_sphere(size)
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        analyzer = StlAnalyzer()
+        # Same block size as the streaming path used for uploads
+        for offset in range(0, len(vectors), STREAM_CHUNK_FACETS):
+            analyzer.add_vectors(vectors[offset:offset + STREAM_CHUNK_FACETS])
+        result = analyzer.result()
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    per_million = best / (len(vectors) / 1e6)
+    ok = per_million <= BUDGET_S_PER_MTRI
+    print(f"{len(vectors):>9} triangles   {best * 1000:9.1f} ms   {per_million:6.3f} s/Mtri   "
+          f"watertight={result['watertight']}   {'ok' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+def main(sizes):
+    print(f"Budget: {BUDGET_S_PER_MTRI} s per million triangles")
+    results = [run(size) for size in sizes]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main([int(s) for s in sys.argv[1:]] or SIZES))
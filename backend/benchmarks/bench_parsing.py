@@ -0,0 +1,88 @@
+"""
+Compares the in-memory STL parser against the original numpy-stl path
+(temp file + mesh.Mesh.from_file + get_mass_properties).
+
+Usage (from the backend directory):
+    python benchmarks/bench_parsing.py [file.stl ...]
+
+Without arguments, a synthetic binary sphere is generated.
+numpy-stl accumulates the volume in float32, so the parsed triangles are also
+checked against a float64 reference computed from the numpy-stl mesh.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from stl import mesh
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import make_sphere, write_binary_stl  # noqa: E402
+from mesh_analysis import analyze_vectors, parse_stl_bytes  # noqa: E402
+
+REPEATS = 3
+SPHERE_TRIANGLES = 640_000
+
+
+def legacy_volume(content):
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".stl") as tmp:
+        tmp.write(content)
+        tmp_path = tmp.name
+    try:
+        volume, _, _ = mesh.Mesh.from_file(tmp_path).get_mass_properties()
+        return volume / 1000
+    finally:
+        os.remove(tmp_path)
+
+
+def reference_volume(content):
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".stl") as tmp:
+        tmp.write(content)
+        tmp_path = tmp.name
+    try:
+        vectors = mesh.Mesh.from_file(tmp_path).vectors.astype(np.float64)
+    finally:
+        os.remove(tmp_path)
+    volume = np.einsum("ij,ij->", vectors[:, 0], np.cross(vectors[:, 1], vectors[:, 2])) / 6
+    return volume / 1000
+
+
+def buffer_volume(content):
+    return analyze_vectors(parse_stl_bytes(content))["volume_cm3"]
+
+
+def best_time(fn, content):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn(content)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(paths):
+    if not paths:
+        path = os.path.join(tempfile.gettempdir(), f"bench_sphere_{SPHERE_TRIANGLES}.stl")
+        if not os.path.exists(path):
+            write_binary_stl(path, make_sphere(SPHERE_TRIANGLES))
+        paths = [path]
+
+    for path in paths:
+        with open(path, "rb") as f:
+            content = f.read()
+        legacy_t, legacy_v = best_time(legacy_volume, content)
+        buffer_t, buffer_v = best_time(buffer_volume, content)
+
+        reference_v = reference_volume(content)
+
+        print(f"{os.path.basename(path)} ({len(content) / 1e6:.1f} MB)")
+        print(f"   from_file + mass props : {legacy_t * 1000:8.1f} ms   volume {legacy_v:.6f} cm3")
+        print(f"   frombuffer + analysis  : {buffer_t * 1000:8.1f} ms   volume {buffer_v:.6f} cm3")
+        print(f"   float64 reference      :             volume {reference_v:.6f} cm3")
+        print(f"   speedup                : {legacy_t / buffer_t:8.2f}x")
+        assert np.isclose(reference_v, buffer_v, rtol=1e-9), "Volume mismatch"
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
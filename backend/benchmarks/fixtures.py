@@ -0,0 +1,167 @@
+"""
+Synthetic fixtures shared by the benchmarks: closed STL meshes (binary and ASCII)
+and populated cart / production trees.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+STL_DTYPE = np.dtype([("normal", "<f4", (3,)), ("vectors", "<f4", (3, 3)), ("attr", "<u2")])
+SPHERE_TRIANGLES = 100_000
+FIXTURE_CONFIG = {"tech": "FDM", "material": "PLA", "infill": 20, "price": 4.2, "weight": 15.1, "volume": 8.0}
+
+
+# --- Meshes ---
+
+def make_cube(size=20.0):
+    """Closed axis-aligned cube with one corner at the origin, 12 outward-facing triangles."""
+    corners = np.array([[x, y, z] for x in (0, size) for y in (0, size) for z in (0, size)], dtype=np.float32)
+    faces = [
+        (0, 1, 3), (0, 3, 2), (4, 6, 7), (4, 7, 5),  # x = 0, x = size
+        (0, 4, 5), (0, 5, 1), (2, 3, 7), (2, 7, 6),  # y = 0, y = size
+        (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3),  # z = 0, z = size
+    ]
+    return corners[np.array(faces)]
+
+
+def make_sphere(triangles, radius=50.0):
+    """Closed UV sphere with about `triangles` faces: shared vertices and pole fans, no seam."""
+    rings = max(3, int(np.sqrt(triangles / 4)))
+    segments = max(3, triangles // (2 * rings))
+    theta = np.linspace(0, np.pi, rings + 1)[1:-1]
+    phi = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    t, p = np.meshgrid(theta, phi, indexing="ij")
+    ring = np.stack([np.sin(t) * np.cos(p), np.sin(t) * np.sin(p), np.cos(t)], -1) * radius
+    north, south = np.array([0, 0, radius]), np.array([0, 0, -radius])
+
+    nxt = np.roll(ring, -1, axis=1)
+    a, b, c, d = ring[:-1], ring[1:], nxt[1:], nxt[:-1]
+    body = np.concatenate([np.stack([a, b, c], -2).reshape(-1, 3, 3), np.stack([a, c, d], -2).reshape(-1, 3, 3)])
+    top = np.stack([np.broadcast_to(north, ring[0].shape), ring[0], nxt[0]], -2)
+    bottom = np.stack([np.broadcast_to(south, ring[-1].shape), nxt[-1], ring[-1]], -2)
+    return np.concatenate([top, body, bottom]).astype(np.float32)
+
+
+def _normals(vectors):
+    normals = np.cross(vectors[:, 1] - vectors[:, 0], vectors[:, 2] - vectors[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(lengths > 0, lengths, 1)
+
+
+def binary_stl_bytes(vectors, header=b"bench"):
+    records = np.zeros(len(vectors), dtype=STL_DTYPE)
+    records["normal"] = _normals(vectors)
+    records["vectors"] = vectors
+    return header.ljust(80, b" ")[:80] + np.uint32(len(vectors)).tobytes() + records.tobytes()
+
+
+def write_binary_stl(path, vectors):
+    with open(path, "wb") as f:
+        f.write(binary_stl_bytes(vectors))
+
+
+def write_ascii_stl(path, vectors, name="bench"):
+    with open(path, "w") as f:
+        f.write(f"solid {name}\n")
+        for normal, tri in zip(_normals(vectors), vectors):
+            f.write(f"  facet normal {normal[0]:e} {normal[1]:e} {normal[2]:e}\n    outer loop\n")
+            for v in tri:
+                f.write(f"      vertex {v[0]:e} {v[1]:e} {v[2]:e}\n")
+            f.write("    endloop\n  endfacet\n")
+        f.write(f"endsolid {name}\n")
+
+
+def stl_fixtures(fixture_dir, high_poly=(1_000_000,)):
+    """
+    Writes (once) the STL fixtures into `fixture_dir` and returns {name: path}:
+    cube and sphere in binary and ASCII, plus one binary sphere per `high_poly` size.
+    """
+    os.makedirs(fixture_dir, exist_ok=True)
+    specs = {
+        "cube_binary": (make_cube, write_binary_stl),
+        "cube_ascii": (make_cube, write_ascii_stl),
+        "sphere_binary": (lambda: make_sphere(SPHERE_TRIANGLES), write_binary_stl),
+        "sphere_ascii": (lambda: make_sphere(SPHERE_TRIANGLES), write_ascii_stl),
+    }
+    for size in high_poly:
+        specs[f"sphere_{size}_binary"] = (lambda size=size: make_sphere(size), write_binary_stl)
+
+    paths = {}
+    for name, (build, write) in specs.items():
+        path = os.path.join(fixture_dir, f"{name}.stl")
+        if not os.path.exists(path):
+            write(path + ".tmp", build())
+            os.replace(path + ".tmp", path)
+        paths[name] = path
+    return paths
+
+
+# --- Cart and production trees ---
+
+def populate_cart(cart_store, cart_dir, cart_token, count, with_files=True, blob_store=None):
+    """
+    Adds `count` small items to one cart and returns them. With `with_files`, each item
+    gets a model: one shared blob when `blob_store` is given, else its own file.
+    """
+    os.makedirs(cart_dir, exist_ok=True)
+    content = binary_stl_bytes(make_cube())
+    sha256 = hashlib.sha256(content).hexdigest()
+    use_blobs = with_files and blob_store is not None
+    if use_blobs:
+        tmp_path = os.path.join(cart_dir, f".{sha256}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        blob_store.store(tmp_path, sha256)
+        if count > 1:
+            blob_store.add_ref(sha256, count - 1)
+    start = datetime.now()
+    items = []
+    with cart_store.db.transaction():
+        for i in range(count):
+            item_id = f"bench-{cart_token[:8]}-{i:07d}"
+            filepath = os.path.join(cart_dir, f"{item_id}_part_{i}.stl")
+            if with_files and not use_blobs:
+                with open(filepath, "wb") as f:
+                    f.write(content)
+            item = {
+                "id": item_id,
+                "filename": f"part_{i}.stl",
+                "filepath": filepath,
+                "config": FIXTURE_CONFIG,
+                "sha256": sha256,
+                "blob": sha256 if use_blobs else None,
+                "analysis": None,
+                "added_at": (start + timedelta(milliseconds=i)).isoformat(),
+                "quantity": 1,
+            }
+            cart_store.add(item, cart_token)
+            items.append(item)
+    return items
+
+
+def populate_production(prod_dir, batches, items_per_batch=5):
+    """
+    Creates `batches` production batch directories with `items_per_batch` sidecars
+    each (about a third of the batches are finished). Model files are not written.
+    """
+    os.makedirs(prod_dir, exist_ok=True)
+    start = datetime(2024, 1, 1)
+    for b in range(batches):
+        batch_id = f"{(start + timedelta(minutes=b)).strftime('%Y-%m-%d_%H-%M-%S')}_{b:06x}"
+        batch_dir = os.path.join(prod_dir, batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        status = "done" if b % 3 == 0 else "Pending"
+        for i in range(items_per_batch):
+            item = {
+                "id": f"{batch_id}-{i}",
+                "filename": f"part_{i}.stl",
+                "config": FIXTURE_CONFIG,
+                "quantity": 1,
+                "status": status,
+                "version": 1,
+            }
+            with open(os.path.join(batch_dir, f"{batch_id}-{i}_part_{i}.stl.json"), "w") as f:
+                json.dump(item, f)
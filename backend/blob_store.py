@@ -0,0 +1,130 @@
+import os
+import time
+
+from file_delivery import variant_paths
+from metadata import fsync_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# Blob files without a row (a crash between the rename and the commit) are only
+# collected once they are this old, so in-flight stores are never touched
+ORPHAN_GRACE_SECONDS = 3600
+
+
+def blob_path(root, sha256):
+    """Location of a blob: fanned out by the first two hex digits of its hash."""
+    return os.path.join(root, sha256[:2], f"{sha256}.stl")
+
+
+def stored_model_path(item, blob_root, logical_path=None):
+    """
+    File holding the model of a cart item or batch sidecar: its blob, or for items
+    stored before the blob store, the file at its own path (`logical_path` defaults
+    to the item's `filepath`).
+    """
+    if item.get("blob"):
+        return blob_path(blob_root, item["blob"])
+    return logical_path or item["filepath"]
+
+
+class BlobStore:
+    """
+    Content-addressed model storage shared by carts and production batches.
+
+    Each distinct STL is stored once, named after its SHA-256, with a reference count
+    in the shared SQLite database. Cart items and batch sidecars keep their usual
+    paths as names and reference the blob through a `blob` field, so moving an item
+    from a cart to a batch transfers its reference without touching the file.
+    Counts change inside BEGIN IMMEDIATE transactions, which serializes concurrent
+    stores and releases of the same content across processes.
+    """
+    def __init__(self, db, root):
+        self.db = db
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.db.conn.executescript(SCHEMA)
+
+    def path(self, sha256):
+        return blob_path(self.root, sha256)
+
+    def store(self, src_path, sha256):
+        """
+        Takes ownership of the file at `src_path` (whose hash is `sha256`) and adds a
+        reference to its blob. When the content is already stored the file is simply
+        dropped. Returns the blob path.
+        """
+        dest = self.path(sha256)
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT refs FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is not None and os.path.exists(dest):
+                os.remove(src_path)
+                conn.execute("UPDATE blobs SET refs = refs + 1 WHERE sha256 = ?", (sha256,))
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(src_path, dest)
+                fsync_dir(os.path.dirname(dest))
+                conn.execute(
+                    "INSERT INTO blobs (sha256, size, refs, created_at) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT(sha256) DO UPDATE SET refs = refs + 1",
+                    (sha256, os.path.getsize(dest), time.time()),
+                )
+        return dest
+
+    def add_ref(self, sha256, count=1):
+        """References an already stored blob `count` more times."""
+        cursor = self.db.execute("UPDATE blobs SET refs = refs + ? WHERE sha256 = ?", (count, sha256))
+        if cursor.rowcount == 0:
+            raise KeyError(sha256)
+
+    def release(self, sha256):
+        """
+        Drops one reference; the blob and its precompressed variants go with the last one.
+        Returns True when the blob was deleted.
+        """
+        dest = self.path(sha256)
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT refs FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is None:
+                return False
+            if row["refs"] > 1:
+                conn.execute("UPDATE blobs SET refs = refs - 1 WHERE sha256 = ?", (sha256,))
+                return False
+            conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+            for path in variant_paths(dest) + [dest]:
+                if os.path.exists(path):
+                    os.remove(path)
+        return True
+
+    def refs(self, sha256):
+        row = self.db.execute("SELECT refs FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return row["refs"] if row else 0
+
+    def usage(self):
+        """Returns (blob count, stored bytes, references)."""
+        row = self.db.execute(
+            "SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS size, COALESCE(SUM(refs), 0) AS refs FROM blobs"
+        ).fetchone()
+        return row["n"], row["size"], row["refs"]
+
+    def collect_orphans(self):
+        """Removes blob files that no row references; returns how many were deleted."""
+        known = {row["sha256"] for row in self.db.execute("SELECT sha256 FROM blobs")}
+        removed = 0
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        for fan_dir in os.scandir(self.root):
+            if not fan_dir.is_dir():
+                continue
+            for entry in os.scandir(fan_dir.path):
+                sha256 = entry.name.split(".", 1)[0]
+                if sha256 in known or entry.stat().st_mtime > cutoff:
+                    continue
+                os.remove(entry.path)
+                removed += 1
+        return removed
@@ -0,0 +1,189 @@
+import glob
+import json
+import os
+import time
+
+# Cart of the clients that do not send a token, and of items created before carts were split
+DEFAULT_CART = "default"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cart_items (
+    id TEXT PRIMARY KEY,
+    added_at TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL,
+    cart_token TEXT NOT NULL DEFAULT 'default',
+    claimed_by TEXT
+);
+CREATE TABLE IF NOT EXISTS carts (
+    token TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_carts_updated_at ON carts (updated_at);
+"""
+
+# Run after the migrations below, once cart_items is known to have the columns
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_cart_items_added_at ON cart_items (added_at);
+CREATE INDEX IF NOT EXISTS idx_cart_items_cart ON cart_items (cart_token, added_at);
+CREATE INDEX IF NOT EXISTS idx_cart_items_claimed ON cart_items (claimed_by);
+"""
+
+
+class CartStore:
+    """
+    Repository for cart items, backed by the shared SQLite database.
+    Items keep the same shape as the former JSON sidecars; `quantity` lives in
+    its own column so updates do not rewrite the metadata.
+    Every item belongs to one cart token. Reads go through the (cart_token, added_at)
+    index, so they only touch that cart's rows. `carts` records the last activity
+    of each cart for the expiry sweep.
+    A production launch claims the rows of a cart (`claimed_by` = batch id) in one
+    transaction; claimed items are hidden from the cart until the launch deletes them
+    or gives them back.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.db.conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(cart_items)")}
+        if "cart_token" not in columns:
+            self.db.execute(f"ALTER TABLE cart_items ADD COLUMN cart_token TEXT NOT NULL DEFAULT '{DEFAULT_CART}'")
+        if "claimed_by" not in columns:
+            self.db.execute("ALTER TABLE cart_items ADD COLUMN claimed_by TEXT")
+        self.db.conn.executescript(INDEXES)
+
+    @staticmethod
+    def _to_item(row):
+        item = json.loads(row["data"])
+        item["quantity"] = row["quantity"]
+        return item
+
+    def touch(self, cart_token):
+        """Records activity on a cart, postponing its expiry."""
+        self.db.execute(
+            "INSERT INTO carts (token, updated_at) VALUES (?, ?) "
+            "ON CONFLICT(token) DO UPDATE SET updated_at = excluded.updated_at",
+            (cart_token, time.time()),
+        )
+
+    def add(self, item, cart_token=DEFAULT_CART):
+        data = {k: v for k, v in item.items() if k != "quantity"}
+        self.db.execute(
+            "INSERT INTO cart_items (id, added_at, quantity, data, cart_token) VALUES (?, ?, ?, ?, ?)",
+            (item["id"], item["added_at"], item.get("quantity", 1), json.dumps(data), cart_token),
+        )
+        self.touch(cart_token)
+
+    def get(self, item_id, cart_token=DEFAULT_CART):
+        row = self.db.execute(
+            "SELECT * FROM cart_items WHERE id = ? AND cart_token = ? AND claimed_by IS NULL", (item_id, cart_token)
+        ).fetchone()
+        return self._to_item(row) if row else None
+
+    def find(self, item_id):
+        """Looks an item up in any cart (file URLs carry the item id, not the cart token)."""
+        row = self.db.execute("SELECT * FROM cart_items WHERE id = ?", (item_id,)).fetchone()
+        return self._to_item(row) if row else None
+
+    def list_items(self, cart_token=DEFAULT_CART):
+        """Returns the items of one cart, newest first."""
+        rows = self.db.execute(
+            "SELECT * FROM cart_items WHERE cart_token = ? AND claimed_by IS NULL ORDER BY added_at DESC",
+            (cart_token,),
+        ).fetchall()
+        return [self._to_item(row) for row in rows]
+
+    def update_quantity(self, item_id, quantity, cart_token=DEFAULT_CART):
+        """Returns False when the item does not exist in this cart."""
+        cursor = self.db.execute(
+            "UPDATE cart_items SET quantity = ? WHERE id = ? AND cart_token = ? AND claimed_by IS NULL",
+            (quantity, item_id, cart_token),
+        )
+        if cursor.rowcount:
+            self.touch(cart_token)
+        return cursor.rowcount > 0
+
+    def delete(self, item_id, cart_token=DEFAULT_CART):
+        """Removes an item of this cart and returns it, or None when it does not exist."""
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM cart_items WHERE id = ? AND cart_token = ? AND claimed_by IS NULL", (item_id, cart_token)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM cart_items WHERE id = ?", (item_id,))
+        self.touch(cart_token)
+        return self._to_item(row)
+
+    def claim(self, cart_token, batch_id):
+        """
+        Marks every unclaimed item of a cart as taken by `batch_id` and returns them,
+        newest first. Concurrent launches (from any process) never claim the same item.
+        """
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE cart_items SET claimed_by = ? WHERE cart_token = ? AND claimed_by IS NULL",
+                (batch_id, cart_token),
+            )
+            rows = conn.execute(
+                "SELECT * FROM cart_items WHERE claimed_by = ? ORDER BY added_at DESC", (batch_id,)
+            ).fetchall()
+        return [self._to_item(row) for row in rows]
+
+    def release_claim(self, batch_id):
+        """Gives the items claimed by a launch that did not happen back to their cart."""
+        self.db.execute("UPDATE cart_items SET claimed_by = NULL WHERE claimed_by = ?", (batch_id,))
+
+    def delete_claimed(self, batch_id):
+        """Removes the items claimed by a launched batch."""
+        self.db.execute("DELETE FROM cart_items WHERE claimed_by = ?", (batch_id,))
+
+    def claims(self):
+        """Batch ids holding claimed items."""
+        rows = self.db.execute("SELECT DISTINCT claimed_by FROM cart_items WHERE claimed_by IS NOT NULL")
+        return [row["claimed_by"] for row in rows]
+
+    def expired_carts(self, ttl_seconds):
+        """Tokens of the carts without activity for `ttl_seconds`."""
+        rows = self.db.execute(
+            "SELECT token FROM carts WHERE updated_at < ?", (time.time() - ttl_seconds,)
+        ).fetchall()
+        return [row["token"] for row in rows]
+
+    def drop_cart(self, cart_token):
+        """Deletes a cart and its items; returns the removed items so their files can be deleted."""
+        with self.db.transaction() as conn:
+            # Items claimed by a launch in progress belong to that launch
+            rows = conn.execute(
+                "SELECT * FROM cart_items WHERE cart_token = ? AND claimed_by IS NULL", (cart_token,)
+            ).fetchall()
+            conn.execute("DELETE FROM cart_items WHERE cart_token = ? AND claimed_by IS NULL", (cart_token,))
+            conn.execute("DELETE FROM carts WHERE token = ?", (cart_token,))
+        return [self._to_item(row) for row in rows]
+
+    def import_json_sidecars(self, cart_dir):
+        """
+        One-shot migration of the legacy `<id>_<name>.json` sidecars into the store.
+        Sidecars are removed once imported; unreadable ones are left in place.
+        Returns the number of imported items.
+        """
+        imported = 0
+        for jf in glob.glob(os.path.join(cart_dir, "*.json")):
+            try:
+                with open(jf, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if "id" not in data or "config" not in data:
+                continue
+            data.setdefault("added_at", "")
+            self.db.execute(
+                "INSERT OR IGNORE INTO cart_items (id, added_at, quantity, data) VALUES (?, ?, ?, ?)",
+                (data["id"], data["added_at"], data.get("quantity", 1),
+                 json.dumps({k: v for k, v in data.items() if k != "quantity"})),
+            )
+            os.remove(jf)
+            imported += 1
+        if imported:
+            self.touch(DEFAULT_CART)
+        return imported
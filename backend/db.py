@@ -0,0 +1,47 @@
+import sqlite3
+import threading
+
+
+class Database:
+    """
+    Thin wrapper around an SQLite file in WAL mode.
+    Each thread gets its own connection, so the FastAPI thread pool, the
+    factory GUI and several uvicorn workers can share the same file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.conn.execute(sql, params)
+
+    def transaction(self):
+        """Context manager running its block in a single write transaction."""
+        return _Transaction(self.conn)
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
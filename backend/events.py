@@ -0,0 +1,51 @@
+import json
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    type TEXT NOT NULL,
+    cart_token TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_created_at ON events (created_at);
+"""
+
+
+class EventLog:
+    """
+    Append-only change log in the shared SQLite database.
+
+    Every process that changes a cart or a batch (API workers, factory GUI) appends
+    an event; subscribers read the rows after the last id they have seen. Ids only
+    grow, so they double as resume positions (SSE Last-Event-ID).
+    Events with a `cart_token` are private to that cart; the others are public.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.db.conn.executescript(SCHEMA)
+
+    def publish(self, event_type, data, cart_token=None, conn=None):
+        """Appends an event; pass `conn` to record it inside the caller's transaction."""
+        (conn or self.db.conn).execute(
+            "INSERT INTO events (created_at, type, cart_token, data) VALUES (?, ?, ?, ?)",
+            (time.time(), event_type, cart_token, json.dumps(data)),
+        )
+
+    def latest_id(self):
+        row = self.db.execute("SELECT MAX(id) AS id FROM events").fetchone()
+        return row["id"] or 0
+
+    def since(self, last_id, cart_token=None, limit=500):
+        """Returns the public events and those of `cart_token` with an id above `last_id`, oldest first."""
+        rows = self.db.execute(
+            "SELECT * FROM events WHERE id > ? AND (cart_token IS NULL OR cart_token = ?) ORDER BY id LIMIT ?",
+            (last_id, cart_token, limit),
+        ).fetchall()
+        return [{"id": row["id"], "type": row["type"], **json.loads(row["data"])} for row in rows]
+
+    def prune(self, max_age_seconds):
+        """Deletes events older than `max_age_seconds`; returns how many were removed."""
+        cursor = self.db.execute("DELETE FROM events WHERE created_at < ?", (time.time() - max_age_seconds,))
+        return cursor.rowcount
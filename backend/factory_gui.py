@@ -1,19 +1,38 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
-import json
 import sys
 import platform
 import subprocess
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from batch_index import BatchIndex
+from blob_store import stored_model_path
+from db import Database
+from events import EventLog
+from metadata import VersionConflict, read_metadata
+from print_estimate import format_duration
+
 # Path configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 PROD_DIR = os.path.join(DATA_DIR, "production")
+BLOB_DIR = os.path.join(DATA_DIR, "blobs")
 
 SLICER_PATH = "/home/kiparis/Bureau/Bambu_Studio_ubuntu-22.04_PR-8834.AppImage"
 
+# Batches listed per page; the next page is loaded when the list is scrolled near its end
+BATCH_PAGE_SIZE = 100
+# How often the shared event log is checked for changes made by the API or other stations
+WATCH_INTERVAL_MS = 1000
+# Batch directories created outside the API are picked up by a slower directory sync
+SYNC_INTERVAL_SECONDS = 60
+# How often results of the background worker are applied to the widgets
+RESULT_POLL_MS = 50
+
 class ProductionManagerApp:
     """
     GUI Application to manage production batches and visualize part details.
@@ -23,8 +42,19 @@ class ProductionManagerApp:
         self.root.title("Production Factory Interface")
         self.root.geometry("1100x700")
         
-        # Dictionary to map tree item IDs to file paths
-        self.part_map = {} 
+        # Sidecar data of the listed parts, keyed by sidecar path (also the part row id)
+        self.part_data = {}
+
+        # Batch summaries shared with the web API; status changes are published to its event feed
+        os.makedirs(PROD_DIR, exist_ok=True)
+        db = Database(os.path.join(DATA_DIR, "store.db"))
+        self.events = EventLog(db)
+        self.batch_index = BatchIndex(db, PROD_DIR, self.events)
+
+        # Disk and database work runs on one worker thread (with its own SQLite connection);
+        # Tk is only touched from the main loop, which applies the queued results
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        self.results = queue.Queue()
         
         # Styles
         self.style = ttk.Style()
@@ -53,16 +83,24 @@ class ProductionManagerApp:
         
         ttk.Label(left_frame, text="Production Batches").pack(anchor="w", pady=(0, 5))
         
-        self.batch_tree = ttk.Treeview(left_frame, columns=("Date", "Status"), show="headings")
+        batch_list = ttk.Frame(left_frame)
+        batch_list.pack(fill=tk.BOTH, expand=True)
+
+        # Rows are keyed by batch id, so a change only updates its own row
+        self.batch_tree = ttk.Treeview(batch_list, columns=("Date", "Status"), show="headings")
         self.batch_tree.heading("Date", text="Batch ID / Date")
         self.batch_tree.heading("Status", text="Status")
         self.batch_tree.column("Date", width=180)
         self.batch_tree.column("Status", width=80)
-        self.batch_tree.pack(fill=tk.BOTH, expand=True)
+        self.batch_scroll = ttk.Scrollbar(batch_list, orient=tk.VERTICAL, command=self.batch_tree.yview)
+        self.batch_tree.configure(yscrollcommand=self.on_batch_scroll)
+        self.batch_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.batch_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.batch_tree.bind("<<TreeviewSelect>>", self.on_batch_select)
-        
-        refresh_btn = ttk.Button(left_frame, text="Refresh List", command=self.load_batches)
-        refresh_btn.pack(pady=5, fill=tk.X)
+
+        # The lists follow changes by themselves; this shows what is loaded
+        self.lbl_status = ttk.Label(left_frame, text="Loading...")
+        self.lbl_status.pack(anchor="w", pady=5)
 
         # --- RIGHT PANEL: PARTS & DETAILS ---
         right_frame = ttk.Frame(self.paned)
@@ -86,6 +124,8 @@ class ProductionManagerApp:
         
         self.part_tree.pack(fill=tk.BOTH, expand=True)
         self.part_tree.bind("<<TreeviewSelect>>", self.on_part_select)
+        self.part_tree.tag_configure('Pending', foreground='black')
+        self.part_tree.tag_configure('done', foreground='green')
 
         # Bottom Right: Details Action Area
         details_frame = ttk.LabelFrame(right_frame, text="Part Details & Actions", padding="15")
@@ -103,9 +143,17 @@ class ProductionManagerApp:
         self.lbl_volume = ttk.Label(details_frame, text="-")
         self.lbl_volume.grid(row=2, column=1, sticky="w", padx=10)
 
+        ttk.Label(details_frame, text="Plates:").grid(row=3, column=0, sticky="w")
+        self.lbl_plates = ttk.Label(details_frame, text="-")
+        self.lbl_plates.grid(row=3, column=1, sticky="w", padx=10)
+
+        ttk.Label(details_frame, text="Print time:").grid(row=4, column=0, sticky="w")
+        self.lbl_print_time = ttk.Label(details_frame, text="-")
+        self.lbl_print_time.grid(row=4, column=1, sticky="w", padx=10)
+
         # Actions Buttons
         btn_frame = ttk.Frame(details_frame)
-        btn_frame.grid(row=0, column=2, rowspan=3, padx=20, sticky="e")
+        btn_frame.grid(row=0, column=2, rowspan=5, padx=20, sticky="e")
 
         self.btn_open_stl = ttk.Button(btn_frame, text="Open 3D Model", command=self.open_stl_file, state=tk.DISABLED)
         self.btn_open_stl.pack(fill=tk.X, pady=2)
@@ -116,121 +164,219 @@ class ProductionManagerApp:
         # Initialization
         self.selected_batch_dir = None
         self.selected_part_data = None
+        self.next_cursor = None
+        self.loading_batches = False
+        self.last_event_id = None
+        self.last_sync = 0.0
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(RESULT_POLL_MS, self.apply_results)
         self.load_batches()
+        self.run_in_background(self.events.latest_id, self.start_watching)
 
-    def load_batches(self):
-        # Clear list
-        for item in self.batch_tree.get_children():
-            self.batch_tree.delete(item)
-            
-        if not os.path.exists(PROD_DIR):
+    # --- Background worker ---
+
+    def run_in_background(self, task, on_done, on_error=None):
+        """
+        Runs `task()` on the worker thread, then `on_done(result)` (or `on_error(exc)`)
+        on the Tk thread.
+        """
+        def job():
             try:
-                os.makedirs(PROD_DIR, exist_ok=True)
-            except OSError:
-                pass 
+                self.results.put((on_done, task()))
+            except Exception as e:
+                self.results.put((on_error or self.report_error, e))
+        self.worker.submit(job)
+
+    def apply_results(self):
+        try:
+            while True:
+                callback, value = self.results.get_nowait()
+                callback(value)
+        except queue.Empty:
+            pass
+        self.root.after(RESULT_POLL_MS, self.apply_results)
 
-        if not os.path.exists(PROD_DIR):
-             return
+    def report_error(self, error):
+        print(f"Background task failed: {error}")
+        self.lbl_status.config(text=f"Error: {error}")
 
-        # List directories
-        batches = [d for d in os.listdir(PROD_DIR) if os.path.isdir(os.path.join(PROD_DIR, d))]
-        batches.sort(reverse=True) # Newest first
+    def on_close(self):
+        self.worker.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
 
+    # --- Batch list ---
+
+    def load_batches(self):
+        """Lists the newest batches; older pages are loaded as the list scrolls."""
+        self.loading_batches = True
+        self.run_in_background(self.fetch_first_page, self.show_batch_page)
+
+    def fetch_first_page(self):
+        # Worker thread: pick up batch directories unknown to the index, then the first page
+        self.batch_index.sync()
+        self.last_sync = time.monotonic()
+        return self.batch_index.query(BATCH_PAGE_SIZE)
+
+    def load_more_batches(self):
+        if self.loading_batches or not self.next_cursor:
+            return
+        self.loading_batches = True
+        cursor = self.next_cursor
+        self.run_in_background(lambda: self.batch_index.query(BATCH_PAGE_SIZE, cursor), self.show_batch_page)
+
+    def show_batch_page(self, page):
+        batches, self.next_cursor = page
         for batch in batches:
-            # Check if all items are done to determine batch status
-            status = self.get_batch_status(batch)
-            self.batch_tree.insert("", tk.END, values=(batch, status))
-
-    def get_batch_status(self, batch_id):
-        batch_path = os.path.join(PROD_DIR, batch_id)
-        json_files = [f for f in os.listdir(batch_path) if f.endswith(".json")]
-        if not json_files: return "Empty"
-        
-        all_done = True
-        for jf in json_files:
-            try:
-                with open(os.path.join(batch_path, jf), 'r') as f:
-                    data = json.load(f)
-                    if data.get('status') != 'done':
-                        all_done = False
-                        break
-            except:
-                all_done = False
-        
-        return "Completed" if all_done else "Pending"
+            self.show_batch(batch)
+        self.loading_batches = False
+        self.lbl_status.config(text=f"{len(self.batch_tree.get_children())} batches listed"
+                                    + (" (scroll for more)" if self.next_cursor else ""))
+
+    def on_batch_scroll(self, first, last):
+        self.batch_scroll.set(first, last)
+        # Near the end of the loaded rows (or when they do not fill the list yet)
+        if float(last) > 0.9:
+            self.load_more_batches()
+
+    def show_batch(self, batch):
+        """Updates the row of one batch summary, or inserts it at its place (newest first)."""
+        values = (batch["id"], batch["status"])
+        if self.batch_tree.exists(batch["id"]):
+            self.batch_tree.item(batch["id"], values=values)
+            return
+        rows = self.batch_tree.get_children()
+        position = next((i for i, row in enumerate(rows) if row < batch["id"]), None)
+        if position is None:
+            # Older than every loaded row: its page has not been loaded yet
+            if self.next_cursor:
+                return
+            position = tk.END
+        self.batch_tree.insert("", position, iid=batch["id"], values=values)
 
     def on_batch_select(self, event):
         selected_item = self.batch_tree.selection()
         if not selected_item: return
-        
-        batch_id = self.batch_tree.item(selected_item[0])['values'][0]
+
+        batch_id = selected_item[0]
         self.selected_batch_dir = os.path.join(PROD_DIR, batch_id)
+        self.clear_parts()
         self.load_parts(self.selected_batch_dir)
 
-    def load_parts(self, batch_path):
-        for item in self.part_tree.get_children():
-            self.part_tree.delete(item)
-        
-        self.reset_details()
-        self.part_map = {} # Reset the map
-        
-        if not os.path.exists(batch_path): return
+    # --- Parts of the selected batch ---
 
-        # Load all JSONs in the folder
-        files = [f for f in os.listdir(batch_path) if f.endswith(".json")]
-        files.sort()
+    def clear_parts(self):
+        self.part_tree.delete(*self.part_tree.get_children())
+        self.part_data = {}
+        self.reset_details()
 
-        for f in files:
-            full_path = os.path.join(batch_path, f)
-            try:
-                with open(full_path, 'r') as json_file:
-                    data = json.load(json_file)
-                    
-                    config = data.get('config', {})
-                    status = data.get('status', 'Pending')
-                    
-                    item_id = self.part_tree.insert("", tk.END, values=(
-                        data.get('filename', 'Unknown'),
-                        config.get('tech', 'N/A'),
-                        config.get('material', 'N/A'),
-                        data.get('quantity', 1),
-                        status
-                    ), tags=(status,))
-                    
-                    # Store the path in the dictionary
-                    self.part_map[item_id] = full_path
-                    
-            except Exception as e:
-                print(f"Error loading {f}: {e}")
+    def load_parts(self, batch_path):
+        self.run_in_background(lambda: read_parts(batch_path), lambda parts: self.show_parts(batch_path, parts))
+
+    def show_parts(self, batch_path, parts):
+        """Brings the part rows in line with `parts`, touching only the rows that changed."""
+        if batch_path != self.selected_batch_dir:
+            return  # Another batch was selected meanwhile
+        for json_path in set(self.part_data) - set(parts):
+            self.part_tree.delete(json_path)
+            del self.part_data[json_path]
+            if self.selected_part_data and self.selected_part_data['json_path'] == json_path:
+                self.reset_details()
+        for json_path, data in parts.items():
+            self.show_part(json_path, data)
+
+    def show_part(self, json_path, data):
+        if self.part_data.get(json_path) == data:
+            return
+        self.part_data[json_path] = data
+        config = data.get('config', {})
+        status = data.get('status', 'Pending')
+        values = (
+            data.get('filename', 'Unknown'),
+            config.get('tech', 'N/A'),
+            config.get('material', 'N/A'),
+            data.get('quantity', 1),
+            status
+        )
+        if self.part_tree.exists(json_path):
+            self.part_tree.item(json_path, values=values, tags=(status,))
+        else:
+            self.part_tree.insert("", tk.END, iid=json_path, values=values, tags=(status,))
 
-        self.part_tree.tag_configure('Pending', foreground='black')
-        self.part_tree.tag_configure('done', foreground='green')
+        # Keep the details of the selected part current
+        if self.selected_part_data and self.selected_part_data['json_path'] == json_path:
+            self.select_part(json_path)
 
     def on_part_select(self, event):
         selected_item = self.part_tree.selection()
         if not selected_item: return
-        
-        item_id = selected_item[0]
-        
-        # Retrieve path from dictionary
-        full_path = self.part_map.get(item_id)
-        
-        if not full_path: return
-        
-        try:
-            with open(full_path, 'r') as jf:
-                d = json.load(jf)
-                self.selected_part_data = d
-                self.selected_part_data['json_path'] = full_path
-                self.display_details(d)
-        except Exception as e:
-            print(f"Error reading part details: {e}")
+        self.select_part(selected_item[0])
+
+    def select_part(self, json_path):
+        data = self.part_data.get(json_path)
+        if data is None: return
+        self.selected_part_data = {**data, 'json_path': json_path}
+        self.display_details(self.selected_part_data)
+
+    # --- Change watcher ---
+
+    def start_watching(self, last_event_id):
+        self.last_event_id = last_event_id
+        self.root.after(WATCH_INTERVAL_MS, self.poll_changes)
+
+    def poll_changes(self):
+        batch_path = self.selected_batch_dir
+        self.run_in_background(
+            lambda: self.collect_changes(batch_path),
+            lambda changes: self.apply_changes(batch_path, changes),
+            self.on_watch_error,
+        )
+
+    def collect_changes(self, batch_path):
+        """
+        Worker thread: reads the shared event log (launches from the API, status changes
+        from any station) and returns the new last event id, the summaries of the changed
+        batches and, when the selected batch changed, its parts.
+        """
+        summaries = []
+        if time.monotonic() - self.last_sync > SYNC_INTERVAL_SECONDS:
+            self.batch_index.sync()
+            self.last_sync = time.monotonic()
+            summaries = self.batch_index.query(BATCH_PAGE_SIZE)[0]
+
+        events = self.events.since(self.last_event_id)
+        changed = {e["batch_id"] for e in events if e["type"].startswith("batch.")}
+        summaries += [batch for batch in map(self.batch_index.get, sorted(changed)) if batch]
+        parts = None
+        if batch_path and os.path.basename(batch_path) in changed:
+            parts = read_parts(batch_path)
+        last_id = events[-1]["id"] if events else self.last_event_id
+        return last_id, summaries, parts
+
+    def apply_changes(self, batch_path, changes):
+        self.last_event_id, summaries, parts = changes
+        for batch in summaries:
+            self.show_batch(batch)
+        if parts is not None:
+            self.show_parts(batch_path, parts)
+        self.root.after(WATCH_INTERVAL_MS, self.poll_changes)
+
+    def on_watch_error(self, error):
+        self.report_error(error)
+        self.root.after(WATCH_INTERVAL_MS, self.poll_changes)
+
+    # --- Details and actions ---
 
     def display_details(self, data):
         self.lbl_filename.config(text=f"File: {data.get('filename')}")
         conf = data.get('config', {})
         self.lbl_infill.config(text=f"{conf.get('infill', 'N/A')}%")
         self.lbl_volume.config(text=f"{round(conf.get('volume', 0), 2)} cm3")
+        # Plate of each copy, as planned at launch
+        plates = [f"{p['plate']} (copy {p['copy']})" for p in data.get('plates', [])]
+        self.lbl_plates.config(text=", ".join(plates) or "Not planned")
+        # Estimated at quote time, so the model does not have to be opened in the slicer
+        estimate = data.get('estimate')
+        self.lbl_print_time.config(text=f"{format_duration(estimate['print_time_s'])} per copy" if estimate else "Not estimated")
         
         self.btn_open_stl.config(state=tk.NORMAL)
         
@@ -243,6 +389,8 @@ class ProductionManagerApp:
         self.lbl_filename.config(text="File: -")
         self.lbl_infill.config(text="-")
         self.lbl_volume.config(text="-")
+        self.lbl_plates.config(text="-")
+        self.lbl_print_time.config(text="-")
         self.btn_open_stl.config(state=tk.DISABLED)
         self.btn_mark_done.config(state=tk.DISABLED)
         self.selected_part_data = None
@@ -251,8 +399,8 @@ class ProductionManagerApp:
         if not self.selected_part_data: return
         
         json_path = self.selected_part_data['json_path']
-        # The STL is usually the same path without .json
-        stl_path = json_path.replace(".json", "")
+        # The sidecar references a shared blob, or (older batches) sits next to its STL
+        stl_path = stored_model_path(self.selected_part_data, BLOB_DIR, json_path[:-len(".json")])
         
         if os.path.exists(stl_path):
             try:
@@ -265,29 +413,53 @@ class ProductionManagerApp:
 
     def mark_as_done(self):
         if not self.selected_part_data: return
-        
+
         json_path = self.selected_part_data['json_path']
-        
-        # Update JSON
+        expected_version = self.selected_part_data.get('version')
+        self.btn_mark_done.config(state=tk.DISABLED)
+
+        # Update JSON and the batch summary, unless another station changed the part meanwhile
+        def task():
+            data = self.batch_index.set_item_status(
+                json_path, 'done',
+                expected_version=expected_version,
+                produced_at=datetime.now().isoformat(),
+            )
+            return data, self.batch_index.get(os.path.basename(os.path.dirname(json_path)))
+
+        self.run_in_background(task, lambda result: self.on_marked_done(json_path, result),
+                               lambda error: self.on_mark_failed(json_path, error))
+
+    def on_marked_done(self, json_path, result):
+        # Only the part row and its batch row change
+        data, batch = result
+        if os.path.dirname(json_path) == self.selected_batch_dir:
+            self.show_part(json_path, data)
+        if batch:
+            self.show_batch(batch)
+
+    def on_mark_failed(self, json_path, error):
+        if isinstance(error, VersionConflict):
+            messagebox.showwarning("Modified", "This part was updated from another station. The list has been reloaded.")
+            self.load_parts(os.path.dirname(json_path))
+        else:
+            messagebox.showerror("Error", f"Failed to update status: {error}")
+            if self.selected_part_data and self.selected_part_data['json_path'] == json_path:
+                self.display_details(self.selected_part_data)
+
+
+def read_parts(batch_path):
+    """Worker thread: the sidecars of a batch directory as {path: data}, sorted by file name."""
+    parts = {}
+    if not os.path.exists(batch_path):
+        return parts
+    for f in sorted(f for f in os.listdir(batch_path) if f.endswith(".json")):
+        full_path = os.path.join(batch_path, f)
         try:
-            with open(json_path, 'r') as f:
-                data = json.load(f)
-            
-            data['status'] = 'done'
-            data['produced_at'] = datetime.now().isoformat()
-            
-            with open(json_path, 'w') as f:
-                json.dump(data, f, indent=4)
-            
-            # Refresh UI
-            self.load_batches()
-            
-            # Restore selection (reload parts and clear selection details)
-            self.load_parts(self.selected_batch_dir)
-            self.reset_details()
-            
+            parts[full_path] = read_metadata(full_path)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to update status: {e}")
+            print(f"Error loading {f}: {e}")
+    return parts
 
 if __name__ == "__main__":
     root = tk.Tk()
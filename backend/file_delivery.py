@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import threading
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are skipped when the module is missing
+    brotli = None
+
+# Preferred first when the client accepts several encodings
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")] if brotli else [("gzip", ".gz")]
+VARIANT_SUFFIXES = (".br", ".gz")
+
+# Uploaded models are stored as "<uuid>_<name>" or as blobs named "<sha256>.stl":
+# the name never points to other content
+CONTENT_ADDRESSED = re.compile(
+    r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_|[0-9a-f]{64}\.stl$)"
+)
+CHUNK_SIZE = 1024 * 1024
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+MAX_MEMOIZED_HASHES = 10000
+_hashes = {}
+_in_progress = set()
+_lock = threading.Lock()
+
+
+def content_hash(path):
+    """SHA-256 of a file, memoized on (path, size, mtime) so each version is read once."""
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    digest = _hashes.get(key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        if len(_hashes) >= MAX_MEMOIZED_HASHES:
+            _hashes.clear()
+        _hashes[key] = digest
+    return digest
+
+
+def _gzip_file(src, dest):
+    with gzip.GzipFile(fileobj=dest, mode="wb", compresslevel=9, mtime=0) as gz:
+        shutil.copyfileobj(src, gz, CHUNK_SIZE)
+
+
+def _brotli_file(src, dest):
+    compressor = brotli.Compressor(quality=9)
+    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+        dest.write(compressor.process(chunk))
+    dest.write(compressor.finish())
+
+
+def precompress(path):
+    """
+    Writes gzip (and brotli, when available) variants next to `path`, streaming
+    through the file so memory does not grow with its size.
+    Safe to call repeatedly; concurrent calls for the same file are skipped.
+    """
+    with _lock:
+        if path in _in_progress:
+            return
+        _in_progress.add(path)
+    try:
+        for encoding, suffix in ENCODINGS:
+            if not os.path.exists(path) or os.path.exists(path + suffix):
+                continue
+            tmp_path = path + suffix + ".tmp"
+            with open(path, "rb") as src, open(tmp_path, "wb") as dest:
+                (_brotli_file if encoding == "br" else _gzip_file)(src, dest)
+            os.replace(tmp_path, path + suffix)
+    finally:
+        with _lock:
+            _in_progress.discard(path)
+
+
+def has_variants(path):
+    return all(os.path.exists(path + suffix) for _, suffix in ENCODINGS)
+
+
+def variant_paths(path):
+    """Existing precompressed variants of `path`, e.g. to move or delete them with it."""
+    return [path + suffix for suffix in VARIANT_SUFFIXES if os.path.exists(path + suffix)]
+
+
+def choose_variant(path, accept_encoding):
+    """Returns (encoding, variant path) for the best accepted variant on disk, or (None, path)."""
+    accepted = {token.split(";")[0].strip() for token in (accept_encoding or "").lower().split(",")}
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.exists(path + suffix):
+            return encoding, path + suffix
+    return None, path
+
+
+def cache_control(path):
+    if CONTENT_ADDRESSED.match(os.path.basename(path)):
+        return IMMUTABLE_CACHE
+    return REVALIDATE_CACHE
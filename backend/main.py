@@ -1,234 +1,829 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import BackgroundTasks, Depends, FastAPI, UploadFile, File, HTTPException, Form, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from stl import mesh
-import tempfile
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import os
 import shutil
 import json
 import uuid
 import glob
-from datetime import datetime
+import hashlib
+import mimetypes
+import re
+import time
+import numpy as np
+from datetime import date, datetime
 
-app = FastAPI()
+from analysis_cache import AnalysisCache
+from analysis_pool import AnalysisPool, JobTimeout, PoolSaturated, WorkerCrashed
+from batch_index import BatchIndex
+from blob_store import BlobStore
+from batch_launch import LAYOUT_NAME, MANIFEST_NAME, BatchLauncher, BatchTooLarge
+from cart_store import DEFAULT_CART, CartStore
+from db import Database
+from events import EventLog
+from file_delivery import IMMUTABLE_CACHE, cache_control, choose_variant, content_hash, has_variants, precompress, variant_paths
+from metadata import read_metadata
+from metrics import CACHE_LOOKUPS, FS_SCANS, MESH_PHASE_SECONDS, REGISTRY, REQUEST_LATENCY, UPLOAD_BYTES, RequestProfiler
+from mesh_analysis import ANALYSIS_VERSION, analyze_stl_path
+from nesting import describe_layout
+from previews import build_preview, preview_path
+from print_estimate import (
+    DEFAULT_LAYER_HEIGHTS, ESTIMATE_VERSION, MAX_LAYER_HEIGHT_MM, MIN_LAYER_HEIGHT_MM, EstimateUnavailable,
+    check_complexity, estimate_key, estimate_stl_path, format_duration, table_estimate, unavailable_estimate,
+)
+from thumbnails import DEFAULT_THUMBNAIL_COLOR, THUMBNAIL_COLORS, build_thumbnail, thumbnail_path
+from uploads import UploadError, UploadSessions
+
+@asynccontextmanager
+async def lifespan(app):
+    # Every worker resolves interrupted launches at startup; launches still running
+    # in another worker are left alone (see BatchLauncher.recover)
+    batch_launcher.recover()
+    batch_index.sync()
+    yield
+    analysis_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- Configuration & Setup ---
 # origins = ["http://localhost:5173", "http://127.0.0.1:5173"]
 # origins = ["https://threed-printing-website-xq1q.onrender.com"]
 origins = ["*"]
 
+# Uploads larger than this are rejected with 413 (MAX_UPLOAD_MB, default 512 MB)
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", 512)) * 1024 * 1024
+# Allowance for the multipart envelope and form fields around the file
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+# Uploads are read, hashed and written in chunks of this size
+IO_CHUNK_SIZE = 1024 * 1024
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuses bodies announced as too large before they are read and spooled to disk."""
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD:
+        return JSONResponse(status_code=413, content={"detail": "File too large"})
+    return await call_next(request)
+
+# Requests carrying `X-Profile: <PROFILE_TOKEN>` answer with a cProfile summary (disabled when unset)
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """
+    Records request latency per route template (time until the response headers are ready).
+    Profiled requests are run to completion and replaced by the profile summary; the
+    original status is returned in X-Profile-Status.
+    """
+    start = time.perf_counter()
+    if PROFILE_TOKEN and request.headers.get("x-profile") == PROFILE_TOKEN:
+        with RequestProfiler() as profiler:
+            response = await call_next(request)
+            body = b"".join([chunk async for chunk in response.body_iterator])
+        if profiler.active:
+            response = PlainTextResponse(profiler.summary(), headers={"X-Profile-Status": str(response.status_code)})
+        else:
+            response = Response(body, status_code=response.status_code, headers=dict(response.headers))
+            response.headers["X-Profile-Status"] = "busy"
+    else:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_LATENCY.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=response.status_code,
+    )
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "X-Next-Cursor", "X-Sync-Token"],
 )
 
 # Define and create storage directories
 DATA_DIR = "data"
 CART_DIR = os.path.join(DATA_DIR, "cart")
 PROD_DIR = os.path.join(DATA_DIR, "production")
+TMP_DIR = os.path.join(DATA_DIR, "tmp")
+STAGING_DIR = os.path.join(DATA_DIR, "staging")
+BLOB_DIR = os.path.join(DATA_DIR, "blobs")
+PREVIEW_DIR = os.path.join(DATA_DIR, "previews")
+THUMBNAIL_DIR = os.path.join(DATA_DIR, "thumbnails")
 
-for d in [CART_DIR, PROD_DIR]:
+for d in [CART_DIR, PROD_DIR, TMP_DIR, PREVIEW_DIR, THUMBNAIL_DIR]:
     os.makedirs(d, exist_ok=True)
 
-# Mount static files for frontend access to STLs
-app.mount("/files", StaticFiles(directory=DATA_DIR), name="files")
+# Cart items live in SQLite; legacy JSON sidecars are imported on first start
+db = Database(os.path.join(DATA_DIR, "store.db"))
+cart_store = CartStore(db)
+cart_store.import_json_sidecars(CART_DIR)
+
+# Models are stored once per content and referenced from cart items and batch sidecars
+blob_store = BlobStore(db, BLOB_DIR)
+
+# Change feed of carts and batches, written by the API and the factory GUI (served at /events)
+events = EventLog(db)
+EVENTS_POLL_INTERVAL = float(os.environ.get("EVENTS_POLL_INTERVAL", 0.5))
+EVENTS_HEARTBEAT = 15
+EVENTS_TTL = 24 * 3600
+
+# Per-batch progress summaries, shared with the factory GUI
+batch_index = BatchIndex(db, PROD_DIR, events)
+
+# Copies of one cart item, and of all the parts of a batch (every copy is nested separately)
+MAX_QUANTITY = int(os.environ.get("MAX_QUANTITY", 1000))
+MAX_BATCH_COPIES = int(os.environ.get("MAX_BATCH_COPIES", 10_000))
+
+# Launches are staged next to the production tree; interrupted ones are resolved at startup
+LAUNCH_MOVE_WORKERS = int(os.environ.get("LAUNCH_MOVE_WORKERS", 8))
+batch_launcher = BatchLauncher(cart_store, batch_index, PROD_DIR, STAGING_DIR, LAUNCH_MOVE_WORKERS, MAX_BATCH_COPIES)
+
+# Mesh analysis results, keyed by the SHA-256 of the STL bytes
+ANALYSIS_CACHE_SIZE = 512
+analysis_cache = AnalysisCache(
+    os.path.join(DATA_DIR, "analysis_cache.json"), max_entries=ANALYSIS_CACHE_SIZE, version=ANALYSIS_VERSION
+)
+
+# Layer heights estimated for every new model (the default of each technology)
+ESTIMATE_LAYER_HEIGHTS = sorted(set(DEFAULT_LAYER_HEIGHTS.values()))
+# Print time and material estimates, one table of infills per model hash and layer height;
+# sized to keep the estimates of every model the analysis cache holds
+ESTIMATE_CACHE_SIZE = ANALYSIS_CACHE_SIZE * len(ESTIMATE_LAYER_HEIGHTS)
+estimate_cache = AnalysisCache(
+    os.path.join(DATA_DIR, "print_estimates.json"), max_entries=ESTIMATE_CACHE_SIZE, version=ESTIMATE_VERSION
+)
+ESTIMATE_RETRY_AFTER = 2
+# (model hash, layer height) pairs being sliced, so concurrent quotes share one job
+estimate_jobs = set()
+
+# Mesh analysis runs in worker processes; beyond ANALYSIS_MAX_PENDING jobs, uploads get a 503
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", os.cpu_count() or 1))
+ANALYSIS_MAX_PENDING = int(os.environ.get("ANALYSIS_MAX_PENDING", ANALYSIS_WORKERS * 4))
+ANALYSIS_TIMEOUT = float(os.environ.get("ANALYSIS_TIMEOUT", 120))
+ANALYSIS_RETRY_AFTER = 5
+analysis_pool = AnalysisPool(ANALYSIS_WORKERS, ANALYSIS_MAX_PENDING, ANALYSIS_TIMEOUT)
+
+REGISTRY.gauge("analysis_pool_pending", "Analysis jobs queued or running.", lambda: analysis_pool.pending)
+REGISTRY.gauge("analysis_cache_entries", "Entries in the mesh analysis cache.", lambda: len(analysis_cache))
+REGISTRY.gauge("print_estimate_cache_entries", "Entries in the print estimate cache.", lambda: len(estimate_cache))
+REGISTRY.gauge("blob_store_bytes", "Bytes of distinct stored models.", lambda: blob_store.usage()[1])
+REGISTRY.gauge("blob_store_references", "Cart items and batch parts referencing stored models.",
+               lambda: blob_store.usage()[2])
+
+# Resumable upload sessions; abandoned ones are collected after UPLOAD_SESSION_TTL
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_MAX_CHUNK_SIZE = 32 * 1024 * 1024
+UPLOAD_SESSION_TTL = 24 * 3600
+upload_sessions = UploadSessions(UPLOAD_DIR, MAX_UPLOAD_BYTES, UPLOAD_SESSION_TTL)
+upload_sessions.collect_garbage()
+
+# Carts are private to the client holding their token (X-Cart-Token header, generated by
+# the browser); requests without one share the default cart. Models of a cart are stored
+# in their own directory, named after a digest of the token so file URLs do not reveal it.
+CART_TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+CART_TTL = int(os.environ.get("CART_TTL_DAYS", 30)) * 24 * 3600
+GC_INTERVAL = 600
+gc_state = {"last_run": time.time()}
+
+# Only these trees are exposed through /files
+SERVED_DIRS = [os.path.realpath(d) for d in (CART_DIR, PROD_DIR)]
 
 # --- Business Data ---
 MATERIALS_DB = {
-    "PLA":  {"density": 1.24, "price": 0.05},
-    "PETG": {"density": 1.27, "price": 0.06},
-    "ABS":  {"density": 1.04, "price": 0.055},
-    "TPU":  {"density": 1.21, "price": 0.08},
-    "RESIN_STD":   {"density": 1.12, "price": 0.12},
-    "RESIN_TOUGH": {"density": 1.18, "price": 0.15},
-    "NYLON_PA12":  {"density": 0.95, "price": 0.18},
-    "NYLON_GLASS": {"density": 1.10, "price": 0.22},
+    "PLA":  {"tech": "FDM", "density": 1.24, "price": 0.05},
+    "PETG": {"tech": "FDM", "density": 1.27, "price": 0.06},
+    "ABS":  {"tech": "FDM", "density": 1.04, "price": 0.055},
+    "TPU":  {"tech": "FDM", "density": 1.21, "price": 0.08},
+    "RESIN_STD":   {"tech": "RESIN", "density": 1.12, "price": 0.12},
+    "RESIN_TOUGH": {"tech": "RESIN", "density": 1.18, "price": 0.15},
+    "NYLON_PA12":  {"tech": "SLS", "density": 0.95, "price": 0.18},
+    "NYLON_GLASS": {"tech": "SLS", "density": 1.10, "price": 0.22},
 }
 MARGIN = 2.00 
+# Machine cost per hour of estimated print time
+MACHINE_HOURLY_RATE = {"FDM": 1.50, "RESIN": 2.00, "SLS": 6.00}
+# Share of the volume counted as solid walls when the shell volume of a part is unknown
+SHELL_RATIO = 0.20
+DEFAULT_INFILLS = list(range(0, 101, 10))
+QUOTE_BATCH_MAX_VOLUMES = 1000
+
+BATCHES_MAX_PAGE = 500
 
 class QuoteRequest(BaseModel):
     volume_cm3: float
     material: str
     infill: int
+    shell_volume_cm3: Optional[float] = None
+
+class BatchQuoteRequest(BaseModel):
+    volumes_cm3: List[float]
+    shell_volumes_cm3: Optional[List[float]] = None
+    materials: Optional[List[str]] = None
+    infills: Optional[List[int]] = None
+
+class UploadInitRequest(BaseModel):
+    filename: str
+    size: int
+
+class UploadFinalizeRequest(BaseModel):
+    config: Optional[dict] = None
 
 class UpdateQtyRequest(BaseModel):
     item_id: str
-    quantity: int
+    quantity: int = Field(le=MAX_QUANTITY)
 
 # --- Helper Functions ---
 
-def compute_price_logic(volume_cm3, material_name, infill_percent):
+def compute_price_matrix(volumes_cm3, material_names, infill_percents, shell_volumes_cm3=None):
+    """
+    Vectorized pricing: returns (price, weight_g) arrays of shape
+    (len(volumes), len(materials), len(infills)), rounded to cents / 0.01 g.
+    Effective volume is the solid shell plus the infilled share of the interior.
+    The shell comes from the mesh analysis (surface area x wall thickness); without
+    it, SHELL_RATIO of the volume is assumed.
+    """
+    volumes = np.asarray(volumes_cm3, dtype=np.float64)[:, None, None]
+    if shell_volumes_cm3 is None:
+        shells = volumes * SHELL_RATIO
+    else:
+        shells = np.minimum(np.asarray(shell_volumes_cm3, dtype=np.float64)[:, None, None], volumes)
+    density = np.array([MATERIALS_DB[m]["density"] for m in material_names])[None, :, None]
+    unit_price = np.array([MATERIALS_DB[m]["price"] for m in material_names])[None, :, None]
+    infill = np.asarray(infill_percents, dtype=np.float64)[None, None, :] / 100
+
+    effective_volume = shells + (volumes - shells) * infill
+    weight_g = effective_volume * density
+    price = weight_g * unit_price + MARGIN
+
+    return np.round(price, 2), np.round(weight_g, 2)
+
+def compute_price_logic(volume_cm3, material_name, infill_percent, shell_volume_cm3=None):
     """
-    Calculates the estimated price and weight based on volume, material density, 
-    and infill percentage. Includes a fixed margin.
+    Calculates the estimated price and weight based on volume, shell volume,
+    material density, and infill percentage. Includes a fixed margin.
     """
     if material_name not in MATERIALS_DB:
         return None, None
-    mat_info = MATERIALS_DB[material_name]
-    
-    # Estimate effective volume based on shell vs infill ratio
-    shell_ratio = 0.20
-    effective_volume = (volume_cm3 * shell_ratio) + (volume_cm3 * (1 - shell_ratio) * (infill_percent / 100))
-    
-    weight_g = effective_volume * mat_info["density"]
-    price = (weight_g * mat_info["price"]) + MARGIN
-    
-    return round(price, 2), round(weight_g, 2)
+    shells = None if shell_volume_cm3 is None else [shell_volume_cm3]
+    price, weight_g = compute_price_matrix([volume_cm3], [material_name], [infill_percent], shells)
+    return float(price[0, 0, 0]), float(weight_g[0, 0, 0])
+
+def write_upload_chunk(f, chunk, hasher):
+    f.write(chunk)
+    hasher.update(chunk)
+
+async def receive_upload(file, dest_path, endpoint):
+    """
+    Streams an upload to `dest_path` in IO_CHUNK_SIZE chunks, hashing it in the same
+    pass. Disk writes and hashing run in the thread pool so the event loop is never
+    blocked; parsing is left to the analysis pool, once the hash shows it is needed.
+    Empty uploads are rejected with 400 and uploads over MAX_UPLOAD_BYTES with 413;
+    the partial file is removed. `endpoint` labels the upload metrics.
+    Returns (sha256, size in bytes).
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    await file.seek(0)
+    f = await run_in_threadpool(open, dest_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(IO_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            UPLOAD_BYTES.inc(len(chunk), endpoint=endpoint)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="File too large")
+            await run_in_threadpool(write_upload_chunk, f, chunk, hasher)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+    except BaseException:
+        await run_in_threadpool(f.close)
+        os.remove(dest_path)
+        raise
+    await run_in_threadpool(f.close)
+    return hasher.hexdigest(), size
+
+def lookup_analysis(file_hash):
+    """Analysis cache lookup, counted in the cache hit-rate metrics."""
+    analysis = analysis_cache.get(file_hash)
+    CACHE_LOOKUPS.inc(cache="analysis", result="miss" if analysis is None else "hit")
+    return analysis
+
+def observe_mesh_timings(timings):
+    for phase, seconds in timings.items():
+        MESH_PHASE_SECONDS.observe(seconds, phase=phase)
+
+async def get_analysis(file_hash, stl_path):
+    """
+    Returns the analysis of the STL stored at `stl_path`, whose SHA-256 is `file_hash`.
+    Cache misses are analyzed in the process pool (see analyze_in_pool).
+    """
+    analysis = lookup_analysis(file_hash)
+    if analysis is not None:
+        return analysis
+    return await analyze_in_pool(file_hash, stl_path)
+
+async def analyze_in_pool(file_hash, stl_path):
+    """
+    Analyzes the STL at `stl_path` in the process pool and caches the result. A saturated
+    pool (or one restarting after a worker crash) answers 503 with Retry-After, a job
+    exceeding ANALYSIS_TIMEOUT answers 504 and a malformed file 400.
+    """
+    try:
+        analysis, timings = await analysis_pool.run(analyze_stl_path, stl_path, True)
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis queue is full, please retry",
+            headers={"Retry-After": str(ANALYSIS_RETRY_AFTER)},
+        )
+    except WorkerCrashed:
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis workers restarted, please retry",
+            headers={"Retry-After": str(ANALYSIS_RETRY_AFTER)},
+        )
+    except JobTimeout:
+        raise HTTPException(status_code=504, detail="Analysis timed out")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid STL file")
+
+    observe_mesh_timings(timings)
+    analysis_cache.put(file_hash, analysis)
+    return analysis
+
+async def generate_preview(file_hash, stl_path):
+    """
+    Background task building the low-poly preview of a stored model in the process pool.
+    Previews are named after the content hash, so they follow the model from the cart
+    to production and are shared by identical uploads. When the pool is busy the preview
+    is skipped and viewers fall back to the full model.
+    """
+    out_path = preview_path(PREVIEW_DIR, file_hash)
+    if os.path.exists(out_path):
+        return
+    try:
+        await analysis_pool.run(build_preview, stl_path, out_path)
+    except (PoolSaturated, WorkerCrashed, JobTimeout, OSError, ValueError) as e:
+        print(f"Preview skipped for {file_hash}: {e!r}")
+
+def lookup_estimate(file_hash, layer_height, infill):
+    """
+    Cached estimate of a model for one layer height and infill: None when it was not
+    computed, the unavailable placeholder when it will not be.
+    """
+    table = estimate_cache.get(estimate_key(file_hash, layer_height))
+    if table is None or "unavailable" in table:
+        return table
+    return table_estimate(table, infill)
+
+def estimates_cached(file_hash, layer_heights, infills):
+    return all(lookup_estimate(file_hash, h, i) is not None for h in layer_heights for i in infills)
+
+def schedule_estimates(background_tasks, file_hash, stl_path, layer_heights=None, infills=None, remove_after=False,
+                       analysis=None):
+    """
+    Queues the print estimates of a stored model for `layer_heights` (default: each
+    technology's) and `infills` (default: DEFAULT_INFILLS), skipping layer heights that
+    are cached or already being sliced. With the model's `analysis`, layer heights
+    beyond the slicing limits are recorded as unavailable instead of being queued.
+    With `remove_after`, `stl_path` is a temporary file removed by the task.
+    Returns whether a task was queued.
+    """
+    layer_heights = layer_heights or ESTIMATE_LAYER_HEIGHTS
+    infills = infills or DEFAULT_INFILLS
+    missing = [h for h in layer_heights
+               if (file_hash, h) not in estimate_jobs and not estimates_cached(file_hash, [h], infills)]
+    if analysis is not None:
+        feasible = []
+        for h in missing:
+            try:
+                check_complexity(analysis["triangle_count"], analysis["bbox_mm"][2], h)
+                feasible.append(h)
+            except EstimateUnavailable as e:
+                estimate_cache.put(estimate_key(file_hash, h), unavailable_estimate(h, e))
+        missing = feasible
+    if not missing:
+        return False
+    estimate_jobs.update((file_hash, h) for h in missing)
+    background_tasks.add_task(compute_estimates, file_hash, stl_path, missing, infills, remove_after)
+    return True
+
+async def compute_estimates(file_hash, stl_path, layer_heights, infills, remove_after=False):
+    """
+    Background task slicing a model in the process pool and caching its estimates
+    (added to the infills already cached for the same layer height).
+    When the pool is busy the estimate is skipped; the next request for it retries.
+    """
+    try:
+        tables = await analysis_pool.run(estimate_stl_path, stl_path, layer_heights, infills)
+        entries = {}
+        for table in tables:
+            key = estimate_key(file_hash, table["layer_height_mm"])
+            cached = estimate_cache.get(key)
+            if cached is not None and "fdm" in cached and "fdm" in table:
+                table["fdm"] = {**cached["fdm"], **table["fdm"]}
+            entries[key] = table
+        estimate_cache.put_many(entries)
+    except (PoolSaturated, WorkerCrashed, JobTimeout, OSError, ValueError) as e:
+        print(f"Print estimate skipped for {file_hash}: {e!r}")
+    finally:
+        estimate_jobs.difference_update((file_hash, h) for h in layer_heights)
+        if remove_after and os.path.exists(stl_path):
+            os.remove(stl_path)
+
+def price_estimate(estimate):
+    """Per material: weight, print time and price (material, machine time and margin) of an estimate."""
+    prices = {}
+    for name, material in MATERIALS_DB.items():
+        tech = material["tech"]
+        weight_g = estimate["material_cm3"][tech] * material["density"]
+        seconds = estimate["print_time_s"][tech]
+        price = weight_g * material["price"] + seconds / 3600 * MACHINE_HOURLY_RATE[tech] + MARGIN
+        prices[name] = {"tech": tech, "print_time_s": seconds, "weight_g": round(weight_g, 2), "price": round(price, 2)}
+    return prices
+
+def item_estimate(item):
+    """
+    Cached estimate of a cart item for its technology, infill and the default layer
+    height, or None when it was not computed.
+    """
+    config = item.get("config") or {}
+    tech = config.get("tech")
+    if tech not in DEFAULT_LAYER_HEIGHTS or not item.get("sha256"):
+        return None
+    layer_height = DEFAULT_LAYER_HEIGHTS[tech]
+    estimate = lookup_estimate(item["sha256"], layer_height, config.get("infill", 100))
+    if estimate is None or "unavailable" in estimate:
+        return None
+    return {
+        "layer_height_mm": layer_height,
+        "print_time_s": estimate["print_time_s"][tech],
+        "material_cm3": estimate["material_cm3"][tech],
+    }
 
 # --- API Routes ---
 
 @app.post("/analyze-file")
-async def analyze_file(file: UploadFile = File(...)):
+async def analyze_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
-    Analyzes an uploaded STL file to extract volume.
-    Uses a temporary file to process the mesh safely.
+    Analyzes an uploaded STL file to extract volume, bounding box, triangle count,
+    surface area, shell volume, overhang areas and watertightness. Repeated uploads
+    of the same file are served from the analysis cache without re-parsing.
+    Print estimates (see /estimate) are computed in the background after the response.
     """
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".stl") as tmp:
-        tmp.write(await file.read())
-        tmp_path = tmp.name
+    # Worker processes read the upload from disk rather than receiving it pickled; the
+    # size limit is enforced while streaming, like /cart/add
+    tmp_path = os.path.join(TMP_DIR, f"{uuid.uuid4()}.stl")
+    file_hash, _ = await receive_upload(file, tmp_path, "analyze_file")
+    keep_upload = False
     try:
-        my_mesh = mesh.Mesh.from_file(tmp_path)
-        volume, _, _ = my_mesh.get_mass_properties()
-        return {"volume_cm3": volume / 1000}
+        analysis = lookup_analysis(file_hash)
+        if analysis is not None and estimates_cached(file_hash, ESTIMATE_LAYER_HEIGHTS, DEFAULT_INFILLS):
+            return {"sha256": file_hash, **analysis}
+        if analysis is None:
+            analysis = await analyze_in_pool(file_hash, tmp_path)
+        # The upload stays on disk until its estimates are computed
+        keep_upload = schedule_estimates(background_tasks, file_hash, tmp_path, remove_after=True, analysis=analysis)
+        return {"sha256": file_hash, **analysis}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if os.path.exists(tmp_path):
+        if not keep_upload and os.path.exists(tmp_path):
             os.remove(tmp_path)
 
 @app.post("/calculate-price")
 def calculate_price_endpoint(req: QuoteRequest):
-    price, weight = compute_price_logic(req.volume_cm3, req.material, req.infill)
+    price, weight = compute_price_logic(req.volume_cm3, req.material, req.infill, req.shell_volume_cm3)
     if price is None:
         raise HTTPException(status_code=400, detail="Unknown material")
     return {"price": price, "weight_g": weight}
 
+@app.post("/calculate-price/batch")
+def calculate_price_batch(req: BatchQuoteRequest):
+    """
+    Quotes many volumes at once across materials (default: all of MATERIALS_DB)
+    and infill values (default: 0 to 100 by steps of 10), using the matching
+    `shell_volumes_cm3` from the analysis when given.
+    `price` and `weight_g` are indexed [volume][material][infill].
+    """
+    materials = req.materials or list(MATERIALS_DB)
+    infills = req.infills or DEFAULT_INFILLS
+    unknown = [m for m in materials if m not in MATERIALS_DB]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown material: {', '.join(unknown)}")
+    if len(req.volumes_cm3) > QUOTE_BATCH_MAX_VOLUMES:
+        raise HTTPException(status_code=400, detail=f"At most {QUOTE_BATCH_MAX_VOLUMES} volumes per request")
+    if req.shell_volumes_cm3 is not None and len(req.shell_volumes_cm3) != len(req.volumes_cm3):
+        raise HTTPException(status_code=400, detail="shell_volumes_cm3 must match volumes_cm3")
+
+    price, weight_g = compute_price_matrix(req.volumes_cm3, materials, infills, req.shell_volumes_cm3)
+    return {
+        "materials": materials,
+        "infills": infills,
+        "price": price.tolist(),
+        "weight_g": weight_g.tolist(),
+    }
+
+@app.get("/estimate/{file_hash}")
+async def get_print_estimate(
+    file_hash: str,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    tech: str = "FDM",
+    infill: int = 20,
+    layer_height: Optional[float] = None,
+):
+    """
+    Print time estimate of a model (by SHA-256) for one layer height (default: the
+    technology's) and infill, with the weight and price (including machine time) of
+    every material. Models are sliced in the background: until the estimate is ready
+    the answer is 202 with Retry-After, so quotes start from /calculate-price and are
+    refined once this returns 200. Models too complex to slice at that layer height
+    answer 422.
+    """
+    if tech not in DEFAULT_LAYER_HEIGHTS:
+        raise HTTPException(status_code=400, detail="Unknown technology")
+    if not 0 <= infill <= 100:
+        raise HTTPException(status_code=400, detail="infill must be between 0 and 100")
+    layer_height = round(layer_height or DEFAULT_LAYER_HEIGHTS[tech], 3)
+    if not MIN_LAYER_HEIGHT_MM <= layer_height <= MAX_LAYER_HEIGHT_MM:
+        raise HTTPException(status_code=400, detail=f"layer_height must be between {MIN_LAYER_HEIGHT_MM} and {MAX_LAYER_HEIGHT_MM} mm")
+    if len(file_hash) != 64 or any(c not in "0123456789abcdef" for c in file_hash):
+        raise HTTPException(status_code=404, detail="Model not found")
+
+    estimate = lookup_estimate(file_hash, layer_height, infill)
+    CACHE_LOOKUPS.inc(cache="print_estimate", result="miss" if estimate is None else "hit")
+    if estimate is None and (file_hash, layer_height) not in estimate_jobs:
+        stl_path = blob_store.path(file_hash)
+        if not os.path.exists(stl_path):
+            raise HTTPException(status_code=404, detail="Model not found")
+        schedule_estimates(background_tasks, file_hash, stl_path, [layer_height], sorted({*DEFAULT_INFILLS, infill}),
+                           analysis=lookup_analysis(file_hash))
+        estimate = lookup_estimate(file_hash, layer_height, infill)
+    if estimate is not None and "unavailable" in estimate:
+        raise HTTPException(status_code=422, detail=f"Print estimate unavailable: {estimate['unavailable']}")
+    if estimate is not None:
+        return {"status": "ready", **estimate, "materials": price_estimate(estimate)}
+
+    response.status_code = 202
+    response.headers["Retry-After"] = str(ESTIMATE_RETRY_AFTER)
+    return {"status": "pending"}
+
+def get_cart_token(x_cart_token: Optional[str] = Header(None)):
+    """Dependency resolving the cart of the request."""
+    if x_cart_token is None:
+        return DEFAULT_CART
+    if not CART_TOKEN_PATTERN.match(x_cart_token):
+        raise HTTPException(status_code=400, detail="Invalid cart token")
+    return x_cart_token
+
+def cart_dir_for(cart_token):
+    """Directory naming one cart's items; it only holds files of items stored before the blob store."""
+    return os.path.join(CART_DIR, hashlib.sha256(cart_token.encode()).hexdigest()[:24])
+
+def release_model(item):
+    """Drops a cart item's reference to its blob, or deletes its own files for items stored before blobs."""
+    if item.get("blob"):
+        if blob_store.release(item["blob"]):
+            remove_renders(item["blob"])
+        return
+    stl_path = item["filepath"]
+    for path in variant_paths(stl_path):
+        os.remove(path)
+    if os.path.exists(stl_path): os.remove(stl_path)
+
+def remove_renders(file_hash):
+    """Deletes the preview and thumbnails of a model whose last copy is gone."""
+    paths = [preview_path(PREVIEW_DIR, file_hash)]
+    paths += [thumbnail_path(THUMBNAIL_DIR, file_hash, color) for color in THUMBNAIL_COLORS]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def collect_garbage():
+    """Every GC_INTERVAL, drops abandoned upload sessions, carts idle for CART_TTL and events older than EVENTS_TTL."""
+    if time.time() - gc_state["last_run"] < GC_INTERVAL:
+        return
+    gc_state["last_run"] = time.time()
+    FS_SCANS.inc(operation="upload_gc")
+    upload_sessions.collect_garbage()
+    events.prune(EVENTS_TTL)
+    for token in cart_store.expired_carts(CART_TTL):
+        for item in cart_store.drop_cart(token):
+            release_model(item)
+        shutil.rmtree(cart_dir_for(token), ignore_errors=True)
+    blob_store.collect_orphans()
+
+def cart_item_config(config):
+    """
+    Checks the configuration sent with a model for the cart and returns it with the
+    item's quantity (its optional "quantity" entry, 1 to MAX_QUANTITY, default 1).
+    """
+    if not isinstance(config, dict):
+        raise HTTPException(status_code=400, detail="Invalid config")
+    config = dict(config)
+    quantity = config.pop("quantity", 1)
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or not 1 <= quantity <= MAX_QUANTITY:
+        raise HTTPException(status_code=400, detail=f"quantity must be between 1 and {MAX_QUANTITY}")
+    return config, quantity
+
+def register_cart_item(item_id, filename, file_path, config, file_hash, analysis, cart_token, quantity=1):
+    """
+    Records an uploaded model in the given cart and returns its metadata.
+    `file_path` names the item (and its /files URL); the bytes live in the blob `file_hash`.
+    """
+    metadata = {
+        "id": item_id,
+        "filename": filename,
+        "filepath": file_path,
+        "blob": file_hash,
+        "config": config, 
+        "sha256": file_hash,
+        "analysis": analysis,
+        "added_at": datetime.now().isoformat(),
+        "quantity": quantity
+    }
+    cart_store.add(metadata, cart_token)
+    events.publish("cart.item_added", {"item_id": item_id, "filename": filename}, cart_token)
+    return metadata
+
 @app.post("/cart/add")
-async def add_to_cart(file: UploadFile = File(...), config: str = Form(...)):
+async def add_to_cart(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    config: str = Form(...),
+    cart_token: str = Depends(get_cart_token),
+):
     """
-    Saves an STL file and its configuration JSON to the cart directory.
+    Stores an STL file in the blob store and registers it, with its configuration, in the caller's cart.
     """
     try:
-        conf_dict = json.loads(config)
+        conf_dict, quantity = cart_item_config(json.loads(config))
         item_id = str(uuid.uuid4())
         
-        # Save STL with unique ID
+        # Name the item with its unique ID; the bytes go to the blob store
         original_name = file.filename
         safe_name = f"{item_id}_{original_name}"
-        file_path = os.path.join(CART_DIR, safe_name)
-        
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-            
-        # Save Metadata
-        meta_path = file_path + ".json"
-        metadata = {
-            "id": item_id,
-            "filename": original_name,
-            "filepath": file_path,
-            "config": conf_dict, 
-            "added_at": datetime.now().isoformat(),
-            "quantity": 1
-        }
+        file_path = os.path.join(cart_dir_for(cart_token), safe_name)
         
-        with open(meta_path, "w") as f:
-            json.dump(metadata, f, indent=4)
+        # Write and hash the upload in one streamed pass; content already analyzed
+        # (e.g. by /analyze-file) is not parsed again, new content goes to the analysis pool
+        tmp_path = os.path.join(TMP_DIR, f"{item_id}.stl")
+        file_hash, _ = await receive_upload(file, tmp_path, "cart_add")
+        try:
+            analysis = await get_analysis(file_hash, tmp_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        stored_path = await run_in_threadpool(blob_store.store, tmp_path, file_hash)
+        register_cart_item(item_id, original_name, file_path, conf_dict, file_hash, analysis, cart_token, quantity)
+        background_tasks.add_task(precompress, stored_path)
+        background_tasks.add_task(generate_preview, file_hash, stored_path)
+        schedule_estimates(background_tasks, file_hash, stored_path, analysis=analysis)
             
         return {"status": "ok", "id": item_id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Resumable Uploads ---
+# init (POST /uploads) -> PUT chunks at increasing offsets -> GET status to resume -> finalize
+
+@app.post("/uploads")
+def init_upload(req: UploadInitRequest):
+    """Opens a resumable upload session for a file of `size` bytes."""
+    collect_garbage()
+    try:
+        state = upload_sessions.create(req.filename, req.size)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"upload_id": state["id"], "offset": 0, "chunk_size": UPLOAD_CHUNK_SIZE}
+
+@app.get("/uploads/{upload_id}")
+def get_upload_status(upload_id: str):
+    """Returns how many bytes were received, i.e. the offset to resume from."""
+    try:
+        state = upload_sessions.get(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"upload_id": upload_id, "offset": state["offset"], "size": state["size"],
+            "complete": state["offset"] == state["size"]}
+
+@app.put("/uploads/{upload_id}")
+async def put_upload_chunk(upload_id: str, offset: int, request: Request):
+    """
+    Receives the raw bytes of one chunk starting at `offset`.
+    An optional X-Chunk-Sha256 header is verified before the chunk is stored.
+    """
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > UPLOAD_MAX_CHUNK_SIZE:
+            raise HTTPException(status_code=413, detail="Chunk too large")
+    UPLOAD_BYTES.inc(len(data), endpoint="uploads")
+    try:
+        state = await run_in_threadpool(
+            upload_sessions.write_chunk, upload_id, offset, bytes(data), request.headers.get("x-chunk-sha256")
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"upload_id": upload_id, "offset": state["offset"], "size": state["size"]}
+
+@app.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    req: UploadFinalizeRequest,
+    background_tasks: BackgroundTasks,
+    cart_token: str = Depends(get_cart_token),
+):
+    """
+    Hands a completed upload to the regular pipeline: with `config` the model is added
+    to the cart (like /cart/add), otherwise it is only analyzed (like /analyze-file).
+    """
+    if req.config is not None:
+        config, quantity = cart_item_config(req.config)
+    try:
+        state, file_hash = await run_in_threadpool(upload_sessions.complete, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    part_path = upload_sessions.part_path(upload_id)
+    analysis = await get_analysis(file_hash, part_path)
+
+    if req.config is None:
+        # The part file leaves the session and stays on disk until its estimates are computed
+        tmp_path = os.path.join(TMP_DIR, f"{upload_id}.stl")
+        os.replace(part_path, tmp_path)
+        if not schedule_estimates(background_tasks, file_hash, tmp_path, remove_after=True, analysis=analysis):
+            os.remove(tmp_path)
+        upload_sessions.discard(upload_id)
+        return {"sha256": file_hash, **analysis}
+
+    # The assembled part file becomes the blob without being rewritten
+    item_id = str(uuid.uuid4())
+    file_path = os.path.join(cart_dir_for(cart_token), f"{item_id}_{state['filename']}")
+    stored_path = await run_in_threadpool(blob_store.store, part_path, file_hash)
+    register_cart_item(item_id, state["filename"], file_path, config, file_hash, analysis, cart_token, quantity)
+    upload_sessions.discard(upload_id)
+    background_tasks.add_task(precompress, stored_path)
+    background_tasks.add_task(generate_preview, file_hash, stored_path)
+    schedule_estimates(background_tasks, file_hash, stored_path, analysis=analysis)
+    return {"status": "ok", "id": item_id}
+
 @app.get("/cart")
-def get_cart():
-    """Retrieves all items currently in the cart, sorted by date."""
-    items = []
-    json_files = glob.glob(os.path.join(CART_DIR, "*.json"))
-    
-    for jf in json_files:
-        try:
-            with open(jf, "r") as f:
-                data = json.load(f)
-                if "id" in data and "config" in data:
-                    items.append(data)
-        except:
-            continue
-    
-    items.sort(key=lambda x: x.get("added_at", ""), reverse=True)
-    return items
+def get_cart(cart_token: str = Depends(get_cart_token)):
+    """Retrieves the items of the caller's cart, sorted by date."""
+    collect_garbage()
+    cart_store.touch(cart_token)
+    return cart_store.list_items(cart_token)
 
 @app.post("/cart/update-qty")
-def update_qty(req: UpdateQtyRequest):
-    json_files = glob.glob(os.path.join(CART_DIR, f"{req.item_id}_*.json"))
-    if not json_files:
+def update_qty(req: UpdateQtyRequest, cart_token: str = Depends(get_cart_token)):
+    quantity = max(req.quantity, 1)
+    if not cart_store.update_quantity(req.item_id, quantity, cart_token):
         raise HTTPException(status_code=404, detail="Item not found")
-    
-    target_file = json_files[0]
-    with open(target_file, "r") as f:
-        data = json.load(f)
-    
-    data["quantity"] = req.quantity
-    if data["quantity"] < 1:
-        data["quantity"] = 1
-        
-    with open(target_file, "w") as f:
-        json.dump(data, f, indent=4)
-        
+    events.publish("cart.quantity_changed", {"item_id": req.item_id, "quantity": quantity}, cart_token)
     return {"status": "updated"}
 
 @app.post("/cart/delete")
-def delete_item(req: UpdateQtyRequest):
-    json_files = glob.glob(os.path.join(CART_DIR, f"{req.item_id}_*.json"))
-    if not json_files:
+def delete_item(req: UpdateQtyRequest, cart_token: str = Depends(get_cart_token)):
+    item = cart_store.delete(req.item_id, cart_token)
+    if item is None:
         return {"status": "not found"}
     
-    json_path = json_files[0]
-    stl_path = json_path.replace(".json", "") 
-    
-    if os.path.exists(json_path): os.remove(json_path)
-    if os.path.exists(stl_path): os.remove(stl_path)
+    release_model(item)
+    events.publish("cart.item_removed", {"item_id": req.item_id}, cart_token)
     
     return {"status": "deleted"}
 
-@app.post("/production/launch")
-def launch_production():
-    """
-    Moves all items from Cart to a new Production Batch.
-    Generates a MANIFEST.txt summary for the admin.
-    """
-    items = get_cart()
-    if not items:
-        raise HTTPException(status_code=400, detail="Cart is empty")
-        
-    batch_id = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    batch_dir = os.path.join(PROD_DIR, batch_id)
-    os.makedirs(batch_dir, exist_ok=True)
-    
-    moved_count = 0
-    total_parts = 0
-    
-    # Initialize Manifest Content
+def render_manifest(batch_id, items, layout):
+    """Text summary of a production batch for the admin, followed by its build plates."""
     summary_lines = []
     summary_lines.append(f"=== PRODUCTION ORDER : {batch_id} ===\n")
     summary_lines.append(f"Date : {datetime.now().strftime('%Y-%m-%d at %H:%M')}\n")
     summary_lines.append("="*50 + "\n\n")
 
+    total_parts = 0
     for index, item in enumerate(items, 1):
-        src_json = item["filepath"] + ".json"
-        src_stl = item["filepath"]
-        
-        dst_json = os.path.join(batch_dir, os.path.basename(src_json))
-        dst_stl = os.path.join(batch_dir, os.path.basename(src_stl))
-        
-        # Move files
-        if os.path.exists(src_json): shutil.move(src_json, dst_json)
-        if os.path.exists(src_stl): shutil.move(src_stl, dst_stl)
-        
-        moved_count += 1
         qty = item.get("quantity", 1)
         total_parts += qty
         
@@ -241,55 +836,109 @@ def launch_production():
         summary_lines.append(f"   Material   : {config.get('material', 'N/A')}\n")
         if config.get('tech') == 'FDM':
             summary_lines.append(f"   Infill     : {config.get('infill', 0)}%\n")
+        if item.get("estimate"):
+            summary_lines.append(f"   Print time : {format_duration(item['estimate']['print_time_s'])} (estimated, per copy)\n")
         
         summary_lines.append(f"   File ID    : {item['id']}\n")
         summary_lines.append("\n" + "-"*30 + "\n\n")
 
     summary_lines.append("="*50 + "\n")
     summary_lines.append(f"TOTAL PARTS TO PRODUCE : {total_parts}\n")
-    summary_lines.append("="*50 + "\n")
+    summary_lines.append("="*50 + "\n\n")
 
-    # Write Manifest
-    summary_path = os.path.join(batch_dir, "PRODUCTION_MANIFEST.txt")
-    with open(summary_path, "w", encoding="utf-8") as f:
-        f.writelines(summary_lines)
-        
-    return {"status": "launched", "batch_id": batch_id, "count": moved_count}
+    summary_lines.append(f"BUILD PLATES : {len(layout['plates'])}\n")
+    summary_lines.append("-"*30 + "\n\n")
+    summary_lines.extend(describe_layout(layout))
+    return "".join(summary_lines)
+
+@app.post("/production/launch")
+def launch_production(cart_token: str = Depends(get_cart_token)):
+    """
+    Moves all items of the caller's cart to a new Production Batch.
+    Generates a MANIFEST.txt summary for the admin.
+    The batch is assembled in a staging directory and published with one rename,
+    so a crash midway never leaves a half-moved cart (see BatchLauncher).
+    """
+    try:
+        batch_id, items = batch_launcher.launch(render_manifest, cart_token, item_estimate)
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if batch_id is None:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    events.publish("batch.launched", {"batch_id": batch_id, "count": len(items)})
+    events.publish("cart.launched", {"batch_id": batch_id}, cart_token)
+    return {"status": "launched", "batch_id": batch_id, "count": len(items)}
+
+@app.get("/events")
+async def event_stream(request: Request, cart_token: Optional[str] = None):
+    """
+    Server-sent events feed of changes: cart.item_added, cart.quantity_changed,
+    cart.item_removed and cart.launched for the cart of `cart_token` (a query parameter,
+    since EventSource cannot send headers), plus batch.launched and batch.item_status
+    for everyone. Each message is a JSON object with `id` and `type`.
+    Reconnecting clients resume after their Last-Event-ID; new ones start from now.
+    Changes made by other processes (factory GUI, other workers) arrive through the
+    shared event log, polled every EVENTS_POLL_INTERVAL with a single indexed query.
+    """
+    token = get_cart_token(cart_token)
+    last_event_id = request.headers.get("last-event-id", "")
+    last_id = int(last_event_id) if last_event_id.isdigit() else await run_in_threadpool(events.latest_id)
+
+    async def stream():
+        nonlocal last_id
+        yield "retry: 3000\n\n"
+        idle = 0.0
+        while not await request.is_disconnected():
+            pending = await run_in_threadpool(events.since, last_id, token)
+            for event in pending:
+                last_id = event["id"]
+                yield f"id: {last_id}\ndata: {json.dumps(event)}\n\n"
+            if pending:
+                idle = 0.0
+                continue
+            if idle >= EVENTS_HEARTBEAT:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            await asyncio.sleep(EVENTS_POLL_INTERVAL)
+            idle += EVENTS_POLL_INTERVAL
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/admin/batches")
-def list_production_batches():
-    if not os.path.exists(PROD_DIR):
-        return []
-    
-    batches = []
-    for name in os.listdir(PROD_DIR):
-        full_path = os.path.join(PROD_DIR, name)
-        if os.path.isdir(full_path):
-            total = 0
-            done = 0
-            json_files = glob.glob(os.path.join(full_path, "*.json"))
-            for jf in json_files:
-                try:
-                    with open(jf, "r") as f:
-                        data = json.load(f)
-                        total += 1
-                        if data.get("status") == "done":
-                            done += 1
-                except: pass
-            
-            status = "Pending"
-            if total > 0 and total == done:
-                status = "Completed"
-            elif done > 0:
-                status = "In Progress"
-
-            batches.append({
-                "id": name,
-                "status": status,
-                "progress": f"{done}/{total}"
-            })
-            
-    batches.sort(key=lambda x: x["id"], reverse=True)
+def list_production_batches(
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    cursor: str = None,
+    status: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    since: str = None,
+):
+    """
+    Lists batch summaries from the batch index, newest first, without reading item sidecars.
+    Pages hold `limit` batches; the next page is requested with the `X-Next-Cursor` header value.
+    With `since` (the `X-Sync-Token` of a previous response), only batches updated after it are returned.
+    Responses carry an ETag and answer 304 to a matching If-None-Match.
+    """
+    limit = max(1, min(limit, BATCHES_MAX_PAGE))
+    count, latest = batch_index.version()
+    etag_source = f"{count}|{latest}|{limit}|{cursor}|{status}|{date_from}|{date_to}|{since}"
+    etag = '"' + hashlib.sha256(etag_source.encode()).hexdigest()[:16] + '"'
+    headers = {"ETag": etag, "X-Sync-Token": latest}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    if since is not None:
+        return batch_index.changes_since(since)
+
+    batches, next_cursor = batch_index.query(limit, cursor, status, date_from, date_to)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return batches
 
 @app.get("/admin/batch/{batch_id}")
@@ -301,7 +950,7 @@ def get_batch_details(batch_id: str):
     safe_id = os.path.basename(batch_id)
     target_dir = os.path.join(PROD_DIR, safe_id)
     
-    manifest_path = os.path.join(target_dir, "PRODUCTION_MANIFEST.txt")
+    manifest_path = os.path.join(target_dir, MANIFEST_NAME)
     manifest_content = ""
     if os.path.exists(manifest_path):
         with open(manifest_path, "r", encoding="utf-8") as f:
@@ -309,23 +958,160 @@ def get_batch_details(batch_id: str):
             
     items = []
     json_files = glob.glob(os.path.join(target_dir, "*.json"))
+    FS_SCANS.inc(operation="batch_details")
     for jf in json_files:
         try:
-            with open(jf, "r") as f:
-                data = json.load(f)
-                stl_filename = os.path.basename(jf).replace(".json", "")
-                
-                items.append({
-                    "id": data.get("id"),
-                    "filename": data.get("filename"),
-                    "status": data.get("status", "Pending"),
-                    "config": data.get("config", {}),
-                    "quantity": data.get("quantity", 1),
-                    "stl_disk_name": stl_filename
-                })
-        except: pass
+            data = read_metadata(jf)
+        except (OSError, ValueError) as e:
+            print(f"Unreadable sidecar {jf}: {e}")
+            continue
+        stl_filename = os.path.basename(jf).replace(".json", "")
+        
+        items.append({
+            "id": data.get("id"),
+            "filename": data.get("filename"),
+            "status": data.get("status", "Pending"),
+            "config": data.get("config", {}),
+            "quantity": data.get("quantity", 1),
+            "sha256": data.get("sha256"),
+            "version": data["version"],
+            "plates": data.get("plates", []),
+            "stl_disk_name": stl_filename
+        })
+
+    # Batches launched before plate nesting have no layout
+    layout = None
+    layout_path = os.path.join(target_dir, LAYOUT_NAME)
+    if os.path.exists(layout_path):
+        with open(layout_path, "r", encoding="utf-8") as f:
+            layout = json.load(f)
 
     return {
         "content": manifest_content,
-        "items": items
-    }
\ No newline at end of file
+        "items": items,
+        "layout": layout
+    }
+
+@app.get("/metrics")
+def get_metrics():
+    """Request latency, upload volume, mesh analysis and cache metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/previews/{file_hash}")
+def get_preview(file_hash: str):
+    """
+    Returns the low-poly preview (quantized, indexed "LOD1" format) of the model with this
+    SHA-256, or 404 while it is not generated yet. Previews never change for a given hash.
+    """
+    if len(file_hash) != 64 or any(c not in "0123456789abcdef" for c in file_hash):
+        raise HTTPException(status_code=404, detail="Preview not found")
+    path = preview_path(PREVIEW_DIR, file_hash)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Preview not found")
+    return FileResponse(path, media_type="application/octet-stream",
+                        headers={"Cache-Control": IMMUTABLE_CACHE, "ETag": f'"{file_hash}-lod"'})
+
+def find_blob_reference(full_path):
+    """Blob referenced by the batch sidecar or cart item named `full_path`, if any."""
+    if full_path.startswith(os.path.realpath(PROD_DIR) + os.sep):
+        try:
+            return read_metadata(full_path + ".json").get("blob")
+        except (OSError, ValueError):
+            return None
+    # Cart item names start with the item id
+    item = cart_store.find(os.path.basename(full_path)[:36])
+    if item is not None and os.path.realpath(item["filepath"]) == full_path:
+        return item.get("blob")
+    return None
+
+def resolve_served_file(file_path):
+    """
+    Maps a /files path to a stored model, or 404 outside the cart and production trees.
+    Paths of items stored as blobs resolve through their cart row or batch sidecar.
+    """
+    full_path = os.path.realpath(os.path.join(DATA_DIR, file_path))
+    if not any(full_path.startswith(root + os.sep) for root in SERVED_DIRS):
+        raise HTTPException(status_code=404, detail="File not found")
+    if not os.path.isfile(full_path):
+        blob = find_blob_reference(full_path)
+        full_path = blob_store.path(blob) if blob else None
+        if full_path is None or not os.path.isfile(full_path):
+            raise HTTPException(status_code=404, detail="File not found")
+    return full_path
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+@app.get("/thumbnails/{file_path:path}")
+async def serve_thumbnail(file_path: str, request: Request, color: str = DEFAULT_THUMBNAIL_COLOR):
+    """
+    PNG thumbnail of a stored model (same paths as /files), drawn in `color`: one of the
+    material colors (hex RGB).
+    Thumbnails are rasterized on the CPU from the low-poly preview on first request
+    and cached per content hash and color.
+    """
+    color = color.lower().lstrip("#")
+    if color not in THUMBNAIL_COLORS:
+        raise HTTPException(status_code=400, detail="Invalid color")
+    full_path = resolve_served_file(file_path)
+    digest = await run_in_threadpool(content_hash, full_path)
+
+    etag = f'"{digest}-{color}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control(full_path)}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    png_path = thumbnail_path(THUMBNAIL_DIR, digest, color)
+    cached = os.path.exists(png_path)
+    CACHE_LOOKUPS.inc(cache="thumbnail", result="hit" if cached else "miss")
+    if not cached:
+        lod_path = preview_path(PREVIEW_DIR, digest)
+        try:
+            if not os.path.exists(lod_path):
+                await analysis_pool.run(build_preview, full_path, lod_path)
+            await analysis_pool.run(build_thumbnail, lod_path, png_path, color)
+        except PoolSaturated:
+            raise HTTPException(
+                status_code=503,
+                detail="Rendering queue is full, please retry",
+                headers={"Retry-After": str(ANALYSIS_RETRY_AFTER)},
+            )
+        except WorkerCrashed:
+            raise HTTPException(
+                status_code=503,
+                detail="Rendering workers restarted, please retry",
+                headers={"Retry-After": str(ANALYSIS_RETRY_AFTER)},
+            )
+        except JobTimeout:
+            raise HTTPException(status_code=504, detail="Thumbnail rendering timed out")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid STL: {e}")
+
+    return FileResponse(png_path, headers=headers, media_type="image/png")
+
+@app.api_route("/files/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_file(file_path: str, request: Request):
+    """
+    Serves stored models from the cart and production trees.
+    ETags are strong and derived from the content hash, precompressed gzip/brotli
+    variants are sent when accepted (missing ones are generated after the response),
+    and Range requests are answered from the uncompressed file.
+    """
+    full_path = resolve_served_file(file_path)
+    digest = await run_in_threadpool(content_hash, full_path)
+    if request.headers.get("range"):
+        encoding, send_path = None, full_path
+    else:
+        encoding, send_path = choose_variant(full_path, request.headers.get("accept-encoding"))
+
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control(full_path), "Vary": "Accept-Encoding"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    background = None if has_variants(full_path) else BackgroundTask(precompress, full_path)
+    media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    return FileResponse(send_path, headers=headers, media_type=media_type, background=background)
@@ -0,0 +1,390 @@
+import io
+import os
+import tempfile
+import time
+import numpy as np
+
+# Binary STL layout: 80-byte header, uint32 facet count, then one 50-byte record per facet
+STL_HEADER_SIZE = 84
+STL_RECORD = np.dtype([
+    ("normals", "<f4", (3,)),
+    ("vectors", "<f4", (3, 3)),
+    ("attr", "<u2"),
+])
+
+ASCII_CHUNK_FACETS = 100_000
+# ASCII text is tokenized this many bytes at a time, so a large read never becomes
+# millions of Python tokens at once
+ASCII_WINDOW_BYTES = 1024 * 1024
+
+# Facets processed per block by the streaming analyzer
+STREAM_CHUNK_FACETS = 250_000
+
+# Edge keys kept in memory before they are spilled to disk, hash-partitioned so each
+# partition can be checked on its own (8 bytes per key, 3 keys per facet)
+EDGE_BUFFER_KEYS = 1_000_000
+EDGE_PARTITION_BITS = 6
+
+# Bumped whenever the analysis output changes, so cached results are recomputed
+ANALYSIS_VERSION = 2
+
+# Perimeter walls printed around every part (3 perimeters with a 0.4 mm nozzle)
+SHELL_THICKNESS_MM = 1.2
+# Down-facing surfaces steeper than these angles from vertical usually need supports
+OVERHANG_ANGLES = (30, 45, 60)
+# Faces within this distance of the lowest point rest on the build plate
+BED_TOLERANCE_MM = 0.01
+
+# Multipliers mixing the float32 bits of a vertex (and vertex pairs) into 64-bit keys
+_KEY_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+_EDGE_MIX = np.uint64(0xD6E8FEB86659FD93)
+
+
+def edge_keys(vectors):
+    """
+    Returns one 64-bit key per triangle edge, identical for both directions of an edge.
+    Vertices are identified by their exact coordinates, as STL files have no indices.
+    Edges of collapsed triangles (two identical corners) are left out.
+    """
+    coords = np.ascontiguousarray(vectors, dtype=np.float32) + np.float32(0)  # folds -0.0 into 0.0
+    bits = coords.view(np.uint32).astype(np.uint64)
+    vertex = np.bitwise_xor.reduce(bits * _KEY_MIX, axis=2)
+    a = vertex
+    b = np.roll(vertex, -1, axis=1)
+    lo, hi = np.minimum(a, b).ravel(), np.maximum(a, b).ravel()
+    keep = lo != hi
+    return lo[keep] * _EDGE_MIX + (hi[keep] ^ (hi[keep] >> np.uint64(29)))
+
+
+def count_edge_uses(keys):
+    """Returns (edges used by one face only, edges shared by more than two faces)."""
+    if not len(keys):
+        return 0, 0
+    keys = np.sort(keys)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    counts = np.diff(np.append(starts, len(keys)))
+    return int((counts == 1).sum()), int((counts > 2).sum())
+
+
+def is_binary_stl(view):
+    """
+    Binary STLs are recognized by their exact size (header + count * record),
+    since many exporters also start binary headers with "solid".
+    """
+    if len(view) < STL_HEADER_SIZE:
+        return False
+    count = int.from_bytes(view[80:84], "little")
+    return len(view) == STL_HEADER_SIZE + count * STL_RECORD.itemsize
+
+
+def iter_ascii_vectors(lines, chunk_facets=ASCII_CHUNK_FACETS):
+    """
+    Yields (n, 3, 3) float32 triangle arrays from the lines of an ASCII STL,
+    `chunk_facets` at a time, so the text is never held as one big list.
+    """
+    coords = []
+    limit = chunk_facets * 9
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 4 and parts[0] == b"vertex":
+            coords.extend(parts[1:])
+            if len(coords) >= limit:
+                yield np.array(coords, dtype=np.float32).reshape(-1, 3, 3)
+                coords = []
+    if len(coords) % 9:
+        raise ValueError("Malformed ASCII STL: incomplete facet")
+    if coords:
+        yield np.array(coords, dtype=np.float32).reshape(-1, 3, 3)
+
+
+def parse_stl_bytes(buffer):
+    """
+    Returns the triangles of an in-memory STL as an (n, 3, 3) float32 array.
+    Binary files are mapped with `np.frombuffer` directly over the upload buffer,
+    without copying; ASCII files fall back to the line-based parser.
+    """
+    view = memoryview(buffer)
+    if is_binary_stl(view):
+        count = int.from_bytes(view[80:84], "little")
+        records = np.frombuffer(view, dtype=STL_RECORD, count=count, offset=STL_HEADER_SIZE)
+        return records["vectors"]
+
+    if bytes(view[:5]).lower() != b"solid":
+        raise ValueError("Not a valid STL file")
+    chunks = list(iter_ascii_vectors(io.BytesIO(view)))
+    if not chunks:
+        return np.zeros((0, 3, 3), dtype=np.float32)
+    return np.concatenate(chunks)
+
+
+class StlAnalyzer:
+    """
+    Incremental STL analyzer fed with consecutive byte chunks.
+    Volume (sum of signed tetrahedra), surface area, overhang areas and bounding box are
+    accumulated facet block by facet block. Edge keys are collected to find open and
+    non-manifold edges once every facet has been seen; past EDGE_BUFFER_KEYS they go to
+    temporary partition files, counted one partition at a time.
+    """
+    def __init__(self, chunk_facets=STREAM_CHUNK_FACETS):
+        self.chunk_facets = chunk_facets
+        self.mode = None
+        self.declared_count = None
+        self._pending = b""
+        self._coords = []
+
+        self.volume = 0.0
+        self.area = 0.0
+        self.count = 0
+        self.mins = np.full(3, np.inf)
+        self.maxs = np.full(3, -np.inf)
+        self.overhangs = np.zeros(len(OVERHANG_ANGLES))
+        self.bed_z = np.inf
+        self.bed_area = 0.0
+        self._edges = []
+        self._edge_count = 0
+        self._spill_files = None
+        # Time spent in feed()/result() overall and in the geometry part of it
+        self.total_seconds = 0.0
+        self.compute_seconds = 0.0
+
+    def add_vectors(self, vectors):
+        """Accumulates an (n, 3, 3) block of triangles."""
+        if not len(vectors):
+            return
+        start = time.perf_counter()
+        v0 = vectors[:, 0].astype(np.float64)
+        v1 = vectors[:, 1].astype(np.float64)
+        v2 = vectors[:, 2].astype(np.float64)
+
+        self.volume += np.einsum("ij,ij->", v0, np.cross(v1, v2)) / 6
+        normals = np.cross(v1 - v0, v2 - v0)
+        doubled_area = np.linalg.norm(normals, axis=1)
+        face_area = doubled_area / 2
+        self.area += face_area.sum()
+        self.count += len(vectors)
+
+        points = vectors.reshape(-1, 3)
+        self.mins = np.minimum(self.mins, points.min(axis=0))
+        self.maxs = np.maximum(self.maxs, points.max(axis=0))
+
+        # Sine of the angle between a down-facing face and the vertical
+        downward = np.divide(-normals[:, 2], doubled_area, out=np.zeros(len(vectors)), where=doubled_area > 0)
+        for i, angle in enumerate(OVERHANG_ANGLES):
+            self.overhangs[i] += face_area[downward > np.sin(np.radians(angle))].sum()
+
+        # Faces resting on the lowest plane seen so far are printed on the bed, not over air
+        z_low = float(points[:, 2].min())
+        top = np.maximum(np.maximum(v0[:, 2], v1[:, 2]), v2[:, 2])
+        on_bed = face_area[(top <= z_low + BED_TOLERANCE_MM) & (downward > 0)].sum()
+        if z_low < self.bed_z - BED_TOLERANCE_MM:
+            self.bed_z, self.bed_area = z_low, on_bed
+        elif z_low <= self.bed_z + BED_TOLERANCE_MM:
+            self.bed_area += on_bed
+
+        keys = edge_keys(vectors)
+        self._edges.append(keys)
+        self._edge_count += len(keys)
+        if self._edge_count > EDGE_BUFFER_KEYS:
+            self._spill_edges()
+        self.compute_seconds += time.perf_counter() - start
+
+    def _spill_edges(self):
+        """Appends the buffered edge keys to their partition files (by their top bits)."""
+        if self._spill_files is None:
+            self._spill_files = [tempfile.TemporaryFile() for _ in range(1 << EDGE_PARTITION_BITS)]
+        keys = np.sort(np.concatenate(self._edges))
+        self._edges, self._edge_count = [], 0
+        bounds = np.arange(1, 1 << EDGE_PARTITION_BITS, dtype=np.uint64) << np.uint64(64 - EDGE_PARTITION_BITS)
+        for f, part in zip(self._spill_files, np.split(keys, np.searchsorted(keys, bounds))):
+            f.write(part.tobytes())
+
+    def _count_edges(self):
+        """Returns (boundary edges, non-manifold edges) over every key collected."""
+        if self._spill_files is None:
+            keys = np.concatenate(self._edges) if self._edges else np.zeros(0, dtype=np.uint64)
+            self._edges = []
+            return count_edge_uses(keys)
+        if self._edges:
+            self._spill_edges()
+        boundary_edges = non_manifold_edges = 0
+        try:
+            for f in self._spill_files:
+                f.seek(0)
+                boundary, non_manifold = count_edge_uses(np.frombuffer(f.read(), dtype=np.uint64))
+                boundary_edges += boundary
+                non_manifold_edges += non_manifold
+        finally:
+            for f in self._spill_files:
+                f.close()
+            self._spill_files = None
+        return boundary_edges, non_manifold_edges
+
+    def feed(self, chunk):
+        start = time.perf_counter()
+        self._feed(chunk)
+        self.total_seconds += time.perf_counter() - start
+
+    def _feed(self, chunk):
+        data = self._pending + chunk if self._pending else chunk
+        self._pending = b""
+
+        if self.mode is None:
+            data = self._detect_mode(data, final=False)
+        if self.mode == "binary":
+            self._consume_binary(data)
+        elif self.mode == "ascii":
+            self._consume_ascii(data, final=False)
+        else:
+            self._pending = data
+
+    def _detect_mode(self, data, final):
+        """Sets `mode` once enough bytes are known and returns the data left to consume."""
+        # ASCII files start with "solid <name>" followed by a facet (or endsolid) line
+        if len(data) < 512 and not final:
+            return data
+        head = bytes(data[:512])
+        first_line_end = head.find(b"\n")
+        rest = head[first_line_end + 1:].lstrip() if first_line_end >= 0 else b""
+        if head[:5].lower() == b"solid" and rest[:5] in (b"facet", b"endso"):
+            self.mode = "ascii"
+            return data
+        if len(data) >= STL_HEADER_SIZE:
+            self.mode = "binary"
+            self.declared_count = int.from_bytes(data[80:84], "little")
+            return memoryview(data)[STL_HEADER_SIZE:]
+        if final:
+            raise ValueError("Not a valid STL file")
+        return data
+
+    def _consume_binary(self, data):
+        view = memoryview(data)
+        usable = len(view) // STL_RECORD.itemsize * STL_RECORD.itemsize
+        if usable:
+            records = np.frombuffer(view[:usable], dtype=STL_RECORD)
+            self.add_vectors(records["vectors"])
+        self._pending = bytes(view[usable:])
+
+    def _consume_ascii(self, data, final):
+        data = bytes(data)
+        end = len(data) if final else data.rfind(b"\n") + 1
+        pos = 0
+        while pos < end:
+            stop = min(pos + ASCII_WINDOW_BYTES, end)
+            if stop < end:
+                stop = data.rfind(b"\n", pos, stop) + 1 or end
+            for line in data[pos:stop].splitlines():
+                parts = line.split()
+                if len(parts) == 4 and parts[0] == b"vertex":
+                    self._coords.extend(parts[1:])
+            pos = stop
+            self._flush_ascii(final=False)
+        self._pending = data[end:]
+        if final:
+            self._flush_ascii(final=True)
+
+    def _flush_ascii(self, final):
+        # Tokens are converted every ASCII_CHUNK_FACETS facets, whatever the stream chunk size
+        usable = len(self._coords) // 9 * 9
+        if usable and (final or usable >= min(self.chunk_facets, ASCII_CHUNK_FACETS) * 9):
+            self.add_vectors(np.array(self._coords[:usable], dtype=np.float32).reshape(-1, 3, 3))
+            del self._coords[:usable]
+
+    def timings(self):
+        """Seconds spent decoding STL bytes vs computing mass properties and topology."""
+        return {"parse": max(self.total_seconds - self.compute_seconds, 0.0), "mass_properties": self.compute_seconds}
+
+    def result(self):
+        """Flushes the remaining bytes and returns the analysis figures."""
+        start = time.perf_counter()
+        try:
+            return self._result()
+        finally:
+            self.total_seconds += time.perf_counter() - start
+
+    def _result(self):
+        data, self._pending = self._pending, b""
+        if self.mode is None and len(data):
+            data = self._detect_mode(data, final=True)
+        if self.mode == "ascii":
+            self._consume_ascii(data, final=True)
+            if self._coords:
+                raise ValueError("Malformed ASCII STL: incomplete facet")
+        elif self.mode == "binary":
+            self._consume_binary(data)
+            if self._pending:
+                raise ValueError("Truncated binary STL")
+            if self.declared_count and self.count != self.declared_count:
+                raise ValueError("Truncated binary STL")
+
+        size = self.maxs - self.mins if self.count else np.zeros(3)
+        topology_start = time.perf_counter()
+        boundary_edges, non_manifold_edges = self._count_edges()
+        self.compute_seconds += time.perf_counter() - topology_start
+        shell = min(self.area * SHELL_THICKNESS_MM, abs(self.volume))
+        overhangs = np.maximum(self.overhangs - self.bed_area, 0)
+        return {
+            "volume_cm3": float(self.volume) / 1000,
+            "surface_area_cm2": float(self.area) / 100,
+            "bbox_mm": [round(float(v), 3) for v in size],
+            "triangle_count": int(self.count),
+            "shell_volume_cm3": float(shell) / 1000,
+            "overhang_area_cm2": {str(a): round(float(v) / 100, 4) for a, v in zip(OVERHANG_ANGLES, overhangs)},
+            "watertight": bool(self.count) and boundary_edges == 0 and non_manifold_edges == 0,
+            "boundary_edges": boundary_edges,
+            "non_manifold_edges": non_manifold_edges,
+        }
+
+
+def analyze_vectors(vectors):
+    """
+    Extracts the geometry figures used for quoting from an (n, 3, 3) triangle array:
+    volume, bounding box, triangle count, surface area, shell volume, overhang
+    areas and watertightness.
+    STL units are assumed to be millimeters.
+    """
+    analyzer = StlAnalyzer()
+    analyzer.add_vectors(vectors)
+    return analyzer.result()
+
+
+def analyze_stl_stream(fileobj, chunk_facets=STREAM_CHUNK_FACETS, with_timings=False):
+    """
+    Analyzes an STL from a binary file object, reading `chunk_facets` records at a time.
+    With `with_timings`, returns (analysis, StlAnalyzer.timings()).
+    """
+    analyzer = StlAnalyzer(chunk_facets)
+    chunk_size = chunk_facets * STL_RECORD.itemsize
+    total = 0
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        analyzer.feed(chunk)
+    if not total:
+        raise ValueError("Empty file")
+    result = analyzer.result()
+    return (result, analyzer.timings()) if with_timings else result
+
+
+def analyze_stl_path(path, with_timings=False):
+    """Analyzes an STL file on disk. Picklable entry point for worker processes."""
+    with open(path, "rb") as f:
+        return analyze_stl_stream(f, with_timings=with_timings)
+
+
+def load_stl_vectors(path):
+    """
+    Returns the (n, 3, 3) triangles of an STL file on disk.
+    Binary files are memory-mapped, so pages are only read as they are used.
+    """
+    with open(path, "rb") as f:
+        head = f.read(STL_HEADER_SIZE)
+        size = os.fstat(f.fileno()).st_size
+    count = int.from_bytes(head[80:84], "little") if len(head) == STL_HEADER_SIZE else -1
+    if size == STL_HEADER_SIZE + count * STL_RECORD.itemsize:
+        if count == 0:
+            return np.zeros((0, 3, 3), dtype=np.float32)
+        return np.memmap(path, dtype=STL_RECORD, mode="r", offset=STL_HEADER_SIZE, shape=(count,))["vectors"]
+    with open(path, "rb") as f:
+        return parse_stl_bytes(f.read())
@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows (factory PCs): byte-range locks through msvcrt instead
+    fcntl = None
+    import msvcrt
+
+# Item sidecars and other JSON metadata shared by the API workers and the factory GUI.
+# Writes go to a temporary file that is fsynced and renamed over the target, so readers
+# only ever see a complete version; read-modify-write cycles hold a per-file advisory
+# lock; every write bumps a "version" counter that callers can check optimistically.
+
+VERSION_KEY = "version"
+LOCK_TIMEOUT = 30
+
+
+class VersionConflict(Exception):
+    """The metadata changed since the caller read it."""
+    def __init__(self, path, expected, actual):
+        super().__init__(f"{os.path.basename(path)} is at version {actual}, expected {expected}")
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+
+
+def fsync_dir(path):
+    """Makes renames inside `path` durable (a no-op where directories cannot be opened)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path, text):
+    """Replaces `path` with `text` so that readers see either the old or the new content."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_dir(directory)
+
+
+def atomic_write_json(path, data, indent=4):
+    atomic_write_text(path, json.dumps(data, indent=indent))
+
+
+def lock_path(path):
+    # Hidden and without a .json extension, so listings never mistake it for an item
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.lock")
+
+
+@contextmanager
+def locked(path, blocking=True):
+    """
+    Holds an exclusive advisory lock on `path` for the duration of the block.
+    The lock lives on a companion file, because atomic writes replace the target inode.
+    With `blocking=False`, raises BlockingIOError at once when the lock is held elsewhere.
+    """
+    fd = os.open(lock_path(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError as e:
+                    if not blocking:
+                        raise BlockingIOError(str(e)) from e
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.05)
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            except OSError:
+                pass
+        os.close(fd)
+
+
+def read_metadata(path):
+    """Loads a metadata file; files written before versioning are at version 0."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    data.setdefault(VERSION_KEY, 0)
+    return data
+
+
+def write_metadata(path, data):
+    """Creates or overwrites a metadata file, as version 1 or one above the current version."""
+    with locked(path):
+        try:
+            current = read_metadata(path)[VERSION_KEY]
+        except (OSError, ValueError):
+            current = 0
+        data = {**data, VERSION_KEY: current + 1}
+        atomic_write_json(path, data)
+    return data
+
+
+def update_metadata(path, fields, expected_version=None):
+    """
+    Applies `fields` to a metadata file under its lock and bumps its version.
+    With `expected_version`, raises VersionConflict if someone else wrote it since.
+    Returns (previous data, updated data).
+    """
+    with locked(path):
+        previous = read_metadata(path)
+        if expected_version is not None and previous[VERSION_KEY] != expected_version:
+            raise VersionConflict(path, expected_version, previous[VERSION_KEY])
+        data = {**previous, **fields, VERSION_KEY: previous[VERSION_KEY] + 1}
+        atomic_write_json(path, data)
+    return previous, data
+
@@ -0,0 +1,174 @@
+import numpy as np
+
+# Build-plate planning for a production batch: every copy of every part is given a
+# plate and a position, per technology and material (parts sharing a plate must share
+# both). Footprints are the XY extents of the part's bounding box plus a spacing
+# margin; plates are filled with first-fit decreasing-height shelf packing, allowing
+# 90 degree rotations. Shelves keep rows easy to clear off a plate, and packing a few
+# hundred parts takes milliseconds.
+
+# Usable build volume (x, y, z) in mm per technology
+BUILD_VOLUMES = {
+    "FDM": (256.0, 256.0, 256.0),
+    "RESIN": (218.0, 123.0, 250.0),
+    "SLS": (165.0, 165.0, 300.0),
+}
+DEFAULT_TECH = "FDM"
+# Gap kept between parts, and between parts and the plate edge
+PART_SPACING = {"FDM": 5.0, "RESIN": 3.0, "SLS": 2.0}
+
+
+def _orient(dims, plate_w, plate_d):
+    """
+    Chooses per part whether to rotate its footprint by 90 degrees: the short side
+    goes along the shelf depth unless only the other orientation fits the plate.
+    Returns (widths, depths, rotated, fits) arrays.
+    """
+    long_side = dims.max(axis=1)
+    short_side = dims.min(axis=1)
+    flat_fits = (long_side <= plate_w) & (short_side <= plate_d)
+    upright_fits = (short_side <= plate_w) & (long_side <= plate_d)
+    widths = np.where(flat_fits, long_side, short_side)
+    depths = np.where(flat_fits, short_side, long_side)
+    # Rotated when the chosen width is not the part's own x extent
+    rotated = ~np.isclose(widths, dims[:, 0])
+    return widths, depths, rotated, flat_fits | upright_fits
+
+
+def _pack_group(widths, depths, plate_w, plate_d):
+    """
+    First-fit decreasing-height shelf packing of one group.
+    Returns (plate index, x, y) per footprint, in input order.
+    """
+    n = len(widths)
+    order = np.lexsort((-widths, -depths))
+    plate = np.empty(n, dtype=np.int64)
+    xs = np.empty(n)
+    ys = np.empty(n)
+
+    # Shelves of all the group's plates (at most one per part) and the used depth of each plate
+    shelf_plate = np.empty(n, dtype=np.int64)
+    shelf_y = np.empty(n)
+    shelf_depth = np.empty(n)
+    shelf_used = np.empty(n)
+    plate_top = np.empty(n)
+    shelves = plates = 0
+    for i in order:
+        w, d = widths[i], depths[i]
+        fits = np.flatnonzero((shelf_depth[:shelves] >= d) & (shelf_used[:shelves] + w <= plate_w))
+        if len(fits):
+            s = fits[0]
+        else:
+            room = np.flatnonzero(plate_top[:plates] + d <= plate_d)
+            if len(room):
+                p = room[0]
+            else:
+                p = plates
+                plate_top[p] = 0.0
+                plates += 1
+            s = shelves
+            shelves += 1
+            shelf_plate[s], shelf_y[s], shelf_depth[s], shelf_used[s] = p, plate_top[p], d, 0.0
+            plate_top[p] += d
+        plate[i] = shelf_plate[s]
+        xs[i] = shelf_used[s]
+        ys[i] = shelf_y[s]
+        shelf_used[s] += w
+    return plate, xs, ys
+
+
+def nest_parts(items):
+    """
+    Plans the build plates of a batch. Each item needs `config` (tech, material),
+    `quantity` and `analysis.bbox_mm`; every copy is placed separately.
+    Returns {"plates": [...], "unplaced": [...]} where each plate lists its parts with
+    their position (mm from the plate corner) and `fill_ratio` is the share of the
+    plate area covered by part footprints (without spacing).
+    """
+    groups = {}
+    unplaced = []
+    for item in items:
+        config = item.get("config") or {}
+        bbox = (item.get("analysis") or {}).get("bbox_mm")
+        copies = max(int(item.get("quantity", 1)), 1)
+        if not bbox:
+            unplaced.append({"item_id": item["id"], "filename": item["filename"], "copies": copies,
+                             "reason": "no geometry analysis"})
+            continue
+        tech = config.get("tech") if config.get("tech") in BUILD_VOLUMES else DEFAULT_TECH
+        key = (tech, config.get("material", "N/A"))
+        groups.setdefault(key, []).append((item, copies, bbox))
+
+    plates = []
+    for (tech, material), entries in sorted(groups.items()):
+        plate_x, plate_y, plate_z = BUILD_VOLUMES[tech]
+        spacing = PART_SPACING[tech]
+        # Spacing is added to every footprint; the plate gets one extra spacing so the
+        # last part of a row only needs its gap to the edge
+        cap_w, cap_d = plate_x - spacing, plate_y - spacing
+
+        item_index = np.repeat(np.arange(len(entries)), [copies for _, copies, _ in entries])
+        copy_number = np.concatenate([np.arange(1, copies + 1) for _, copies, _ in entries])
+        bboxes = np.array([bbox for _, _, bbox in entries], dtype=np.float64)[item_index]
+        dims = bboxes[:, :2] + spacing
+
+        widths, depths, rotated, fits = _orient(dims, cap_w, cap_d)
+        fits &= bboxes[:, 2] <= plate_z
+        for k in np.flatnonzero(~fits):
+            item = entries[item_index[k]][0]
+            unplaced.append({"item_id": item["id"], "filename": item["filename"], "copy": int(copy_number[k]),
+                             "reason": "larger than the build volume"})
+
+        placed = np.flatnonzero(fits)
+        if not len(placed):
+            continue
+        plate_of, xs, ys = _pack_group(widths[placed], depths[placed], cap_w, cap_d)
+        part_area = bboxes[placed, 0] * bboxes[placed, 1]
+        for p in range(plate_of.max() + 1):
+            on_plate = np.flatnonzero(plate_of == p)
+            parts = []
+            for j in on_plate:
+                k = placed[j]
+                item = entries[item_index[k]][0]
+                parts.append({
+                    "item_id": item["id"],
+                    "filename": item["filename"],
+                    "copy": int(copy_number[k]),
+                    "x": round(float(xs[j] + spacing), 1),
+                    "y": round(float(ys[j] + spacing), 1),
+                    "rotated": bool(rotated[k]),
+                })
+            plates.append({
+                "id": f"{tech}-{material}-{p + 1}",
+                "tech": tech,
+                "material": material,
+                "size_mm": [plate_x, plate_y],
+                "fill_ratio": round(float(part_area[on_plate].sum() / (plate_x * plate_y)), 3),
+                "parts": parts,
+            })
+    return {"plates": plates, "unplaced": unplaced}
+
+
+def plates_by_item(layout):
+    """Maps item id -> list of {plate, copy} assignments."""
+    assignments = {}
+    for plate in layout["plates"]:
+        for part in plate["parts"]:
+            assignments.setdefault(part["item_id"], []).append({"plate": plate["id"], "copy": part["copy"]})
+    return assignments
+
+
+def describe_layout(layout):
+    """Manifest lines listing each plate, its fill ratio and its parts."""
+    lines = []
+    for plate in layout["plates"]:
+        width, depth = plate["size_mm"]
+        lines.append(f"PLATE {plate['id']} ({width:g} x {depth:g} mm) : {len(plate['parts'])} parts, "
+                     f"fill {plate['fill_ratio']:.0%}\n")
+        for part in plate["parts"]:
+            rotated = "  [rotated 90]" if part["rotated"] else ""
+            lines.append(f"   - {part['filename']} (copy {part['copy']}) at x={part['x']:g} y={part['y']:g}{rotated}\n")
+        lines.append("\n")
+    for part in layout["unplaced"]:
+        lines.append(f"NOT PLACED : {part['filename']} - {part['reason']}\n")
+    return lines
@@ -0,0 +1,129 @@
+import os
+import struct
+import numpy as np
+
+from mesh_analysis import load_stl_vectors
+
+# Low-poly previews of uploaded models, keyed by the SHA-256 of the STL.
+#
+# File layout (little endian):
+#   magic "LOD1" | index size (2 or 4) u32 | vertex count u32 | triangle count u32
+#   origin 3 x f32 | step 3 x f32
+#   vertices: count x 3 x u16, position = origin + q * step
+#   padding to a 4-byte boundary
+#   triangles: count x 3 x u16 / u32 vertex indices
+PREVIEW_MAGIC = b"LOD1"
+PREVIEW_HEADER = struct.Struct("<4sIII3f3f")
+PREVIEW_SUFFIX = ".lod"
+PREVIEW_TARGET_TRIANGLES = 15000
+QUANTIZATION_LEVELS = 65535
+MAX_CLUSTER_PASSES = 6
+
+
+def preview_path(preview_dir, file_hash):
+    return os.path.join(preview_dir, file_hash + PREVIEW_SUFFIX)
+
+
+def _cluster(points, mins, cell, resolution):
+    """Snaps every vertex to a grid cell; returns (cell of each vertex, triangles as cell indices)."""
+    q = np.floor((points - mins) / cell).astype(np.int64)
+    np.clip(q, 0, resolution, out=q)
+    keys = (q[:, 0] * (resolution + 1) + q[:, 1]) * (resolution + 1) + q[:, 2]
+    _, inverse = np.unique(keys, return_inverse=True)
+    return inverse.reshape(-1), inverse.reshape(-1, 3)
+
+
+def _clean_triangles(triangles):
+    """Drops triangles collapsed by clustering and duplicates of the same face."""
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    triangles = triangles[(a != b) & (b != c) & (a != c)]
+    if len(triangles) == 0:
+        return triangles
+    _, first = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    return triangles[np.sort(first)]
+
+
+def decimate(vectors, target_triangles=PREVIEW_TARGET_TRIANGLES):
+    """
+    Reduces an (n, 3, 3) triangle soup to an indexed mesh of at most about
+    `target_triangles` faces by vertex clustering: vertices falling in the same grid
+    cell are merged at their mean position. The grid is refined or coarsened until
+    the face count fits the budget.
+    Returns (vertices float32 (v, 3), triangles int64 (t, 3)).
+    """
+    points = np.asarray(vectors, dtype=np.float32).reshape(-1, 3)
+    if len(points) == 0:
+        return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.int64)
+
+    mins = points.min(axis=0)
+    extent = float((points.max(axis=0) - mins).max()) or 1.0
+
+    if len(points) // 3 <= target_triangles:
+        # Already small enough: only weld identical vertices
+        unique, inverse = np.unique(points, axis=0, return_inverse=True)
+        return unique, _clean_triangles(inverse.reshape(-1, 3))
+
+    resolution = max(8, int(np.sqrt(target_triangles)))
+    for _ in range(MAX_CLUSTER_PASSES):
+        cell = extent / resolution
+        inverse, triangles = _cluster(points, mins, cell, resolution)
+        triangles = _clean_triangles(triangles)
+        if len(triangles) <= target_triangles or resolution <= 8:
+            break
+        resolution = max(8, int(resolution * np.sqrt(target_triangles / len(triangles)) * 0.95))
+
+    counts = np.bincount(inverse)
+    vertices = np.stack(
+        [np.bincount(inverse, weights=points[:, axis]) / counts for axis in range(3)], axis=1
+    ).astype(np.float32)
+
+    # Keep only the vertices still referenced by a triangle
+    used, remapped = np.unique(triangles, return_inverse=True)
+    return vertices[used], remapped.reshape(-1, 3)
+
+
+def encode_preview(vertices, triangles):
+    """Serializes an indexed mesh with 16-bit quantized positions."""
+    if len(vertices):
+        origin = vertices.min(axis=0)
+        step = (vertices.max(axis=0) - origin) / QUANTIZATION_LEVELS
+    else:
+        origin = step = np.zeros(3, dtype=np.float32)
+    step = np.where(step > 0, step, 1.0).astype(np.float32)
+    quantized = np.rint((vertices - origin) / step).clip(0, QUANTIZATION_LEVELS).astype("<u2")
+
+    index_size = 2 if len(vertices) <= 0xFFFF else 4
+    indices = triangles.astype("<u2" if index_size == 2 else "<u4")
+    vertex_bytes = quantized.tobytes()
+    padding = b"\0" * (-len(vertex_bytes) % 4)
+    header = PREVIEW_HEADER.pack(
+        PREVIEW_MAGIC, index_size, len(vertices), len(triangles), *origin.tolist(), *step.tolist()
+    )
+    return header + vertex_bytes + padding + indices.tobytes()
+
+
+def decode_preview(data):
+    """Inverse of `encode_preview`: returns (vertices float32 (v, 3), triangles (t, 3))."""
+    magic, index_size, vertex_count, triangle_count, *scale = PREVIEW_HEADER.unpack_from(data)
+    if magic != PREVIEW_MAGIC:
+        raise ValueError("Not a preview file")
+    origin, step = np.array(scale[:3], dtype=np.float32), np.array(scale[3:], dtype=np.float32)
+    offset = PREVIEW_HEADER.size
+    quantized = np.frombuffer(data, dtype="<u2", count=vertex_count * 3, offset=offset)
+    offset += quantized.nbytes + (-quantized.nbytes % 4)
+    triangles = np.frombuffer(data, dtype="<u2" if index_size == 2 else "<u4", count=triangle_count * 3, offset=offset)
+    vertices = origin + quantized.reshape(-1, 3).astype(np.float32) * step
+    return vertices, triangles.reshape(-1, 3)
+
+
+def build_preview(stl_path, out_path, target_triangles=PREVIEW_TARGET_TRIANGLES):
+    """
+    Writes the preview of `stl_path` to `out_path` (atomically) and returns its
+    triangle count. Runs in the analysis worker processes.
+    """
+    vertices, triangles = decimate(load_stl_vectors(stl_path), target_triangles)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_preview(vertices, triangles))
+    os.replace(tmp_path, out_path)
+    return len(triangles)
@@ -0,0 +1,261 @@
+import numpy as np
+
+from mesh_analysis import load_stl_vectors
+
+# Print time and material estimates from a sliced model. The mesh is cut by one
+# horizontal plane per layer (at mid-layer height): every triangle crossing a plane
+# yields one contour segment, computed for blocks of (triangle, layer) pairs at once
+# with NumPy. Per layer this gives the contour length and, with segments oriented by the
+# face normals, the enclosed cross-section area (shoelace formula). Perimeter and
+# infill path lengths, layer count and material then drive a simple time model per
+# technology. Parts are estimated alone, as if printed by themselves.
+
+# Bumped whenever the estimate output changes, so cached estimates are recomputed
+ESTIMATE_VERSION = 3
+
+# Layer height used when the quote does not choose one
+DEFAULT_LAYER_HEIGHTS = {"FDM": 0.2, "RESIN": 0.05, "SLS": 0.1}
+MIN_LAYER_HEIGHT_MM = 0.02
+MAX_LAYER_HEIGHT_MM = 1.0
+
+# Process parameters of each technology
+PROCESS_PROFILES = {
+    # Extruded paths: walls around each contour, solid top/bottom layers, sparse infill
+    "FDM": {"line_width_mm": 0.45, "walls": 3, "solid_layers": 4,
+            "perimeter_speed_mm_s": 40.0, "infill_speed_mm_s": 80.0, "layer_change_s": 2.0},
+    # Whole layers are exposed at once: the time only depends on the layer count
+    "RESIN": {"exposure_s": 2.5, "bottom_layers": 5, "bottom_exposure_s": 30.0, "lift_s": 6.0},
+    # The laser traces contours and hatches the cross-section, then powder is recoated
+    "SLS": {"hatch_spacing_mm": 0.12, "scan_speed_mm_s": 5000.0, "contour_speed_mm_s": 1500.0, "recoat_s": 9.0},
+}
+
+# Slicing blocks: at most this many triangles, and about this many (triangle, layer)
+# crossings, the rows every per-segment array is sized by
+SLICE_CHUNK_TRIANGLES = 200_000
+SLICE_BLOCK_ROWS = 500_000
+# Beyond these the estimate is reported unavailable instead of being computed
+MAX_SLICE_LAYERS = 20_000
+MAX_SLICE_ROWS = 20_000_000
+MAX_ESTIMATE_TRIANGLES = 5_000_000
+
+
+class EstimateUnavailable(ValueError):
+    """The model is too complex to slice at this layer height."""
+
+
+def check_complexity(triangles, height_mm, layer_height):
+    """
+    Raises EstimateUnavailable when a model of `triangles` facets and `height_mm` is
+    beyond the slicing limits at `layer_height`. Cheap check run before a job is queued.
+    """
+    if triangles > MAX_ESTIMATE_TRIANGLES:
+        raise EstimateUnavailable(f"{triangles} triangles, the limit is {MAX_ESTIMATE_TRIANGLES}")
+    layers = int(np.ceil(height_mm / layer_height))
+    if layers > MAX_SLICE_LAYERS:
+        raise EstimateUnavailable(f"{layers} layers, the limit is {MAX_SLICE_LAYERS}")
+
+
+def unavailable_estimate(layer_height, reason):
+    """Placeholder cached for a layer height whose estimates will not be computed."""
+    return {"layer_height_mm": layer_height, "unavailable": str(reason)}
+
+
+def estimate_key(file_hash, layer_height):
+    """Cache key of the estimate table of a model (by hash) at one layer height."""
+    return f"{file_hash}:{layer_height:g}"
+
+
+def format_duration(seconds):
+    """Print time as "3 h 05 min" (or "12 min")."""
+    minutes = round(seconds / 60)
+    return f"{minutes // 60} h {minutes % 60:02d} min" if minutes >= 60 else f"{minutes} min"
+
+
+def _cut(lower, upper, z):
+    """Points where the edges (lower, upper) cross the heights `z`."""
+    span = upper[:, 2] - lower[:, 2]
+    t = (z - lower[:, 2]) / np.where(span > 0, span, 1)
+    return lower[:, :2] + (upper[:, :2] - lower[:, :2]) * t[:, None]
+
+
+def _layer_span(vectors, z_min, layer_height, layers):
+    """First layer crossed by each triangle and the number of layers it crosses."""
+    z = np.asarray(vectors[:, :, 2], dtype=np.float64)
+    low, high = z.min(axis=1), z.max(axis=1)
+    # Layers whose mid-height plane crosses each triangle; flat triangles add no contour
+    first = np.ceil((low - z_min) / layer_height - 0.5).astype(np.int64)
+    last = np.floor((high - z_min) / layer_height - 0.5).astype(np.int64)
+    np.clip(first, 0, layers - 1, out=first)
+    np.clip(last, -1, layers - 1, out=last)
+    counts = np.where(high > low, np.maximum(last - first + 1, 0), 0)
+    return first, counts
+
+
+def _slice_block(vectors, first, counts, z_min, layer_height, contours, areas):
+    """Adds the contour length and area of a block of triangles to the per-layer totals."""
+    layers = len(contours)
+    tri = np.asarray(vectors, dtype=np.float64)
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    tri = np.take_along_axis(tri, np.argsort(tri[:, :, 2], axis=1)[:, :, None], axis=1)
+    low, mid, high = tri[:, 0], tri[:, 1], tri[:, 2]
+
+    # One row per (triangle, layer) crossing
+    index = np.repeat(np.arange(len(tri)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    layer = first[index] + offsets
+    z = z_min + (layer + 0.5) * layer_height
+
+    a, b, c = low[index], mid[index], high[index]
+    # One end lies on the long edge, the other on the edge below or above the middle vertex
+    p = _cut(a, c, z)
+    above = (z >= b[:, 2])[:, None]
+    q = np.where(above, _cut(b, c, z), _cut(a, b, z))
+
+    d = q - p
+    contours += np.bincount(layer, weights=np.hypot(d[:, 0], d[:, 1]), minlength=layers)
+    # Outward normals put the solid on the left of a counter-clockwise contour
+    n = normals[index]
+    direction = np.sign(n[:, 0] * d[:, 1] - n[:, 1] * d[:, 0])
+    cross = p[:, 0] * q[:, 1] - q[:, 0] * p[:, 1]
+    areas += np.bincount(layer, weights=0.5 * cross * direction, minlength=layers)
+
+
+def slice_profile(vectors, layer_height):
+    """
+    Slices an (n, 3, 3) triangle array every `layer_height` mm.
+    Returns (contour length in mm, cross-section area in mm2) arrays, one entry per layer.
+    Areas are signed by the face winding, which is unreliable in STL files: the whole
+    mesh is flipped when its total (its volume) comes out negative.
+    Raises EstimateUnavailable beyond MAX_SLICE_LAYERS layers or MAX_SLICE_ROWS crossings.
+    """
+    if len(vectors) == 0:
+        return np.zeros(0), np.zeros(0)
+    z_min = float(vectors[:, :, 2].min())
+    z_max = float(vectors[:, :, 2].max())
+    if z_max <= z_min:
+        return np.zeros(0), np.zeros(0)
+    layers = int(np.ceil((z_max - z_min) / layer_height))
+    if layers > MAX_SLICE_LAYERS:
+        raise EstimateUnavailable(f"{layers} layers, the limit is {MAX_SLICE_LAYERS}")
+
+    # Crossings per triangle first: they size the blocks and the total work
+    first = np.empty(len(vectors), dtype=np.int64)
+    counts = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), SLICE_CHUNK_TRIANGLES):
+        stop = start + SLICE_CHUNK_TRIANGLES
+        first[start:stop], counts[start:stop] = _layer_span(vectors[start:stop], z_min, layer_height, layers)
+    ends = np.cumsum(counts)
+    if ends[-1] > MAX_SLICE_ROWS:
+        raise EstimateUnavailable(f"{ends[-1]} layer crossings, the limit is {MAX_SLICE_ROWS}")
+
+    contours = np.zeros(layers)
+    areas = np.zeros(layers)
+    start = 0
+    while start < len(vectors):
+        # Whole triangles up to SLICE_BLOCK_ROWS rows (a single triangle may exceed it,
+        # by at most MAX_SLICE_LAYERS rows)
+        done = ends[start - 1] if start else 0
+        stop = int(np.searchsorted(ends, done + SLICE_BLOCK_ROWS, side="right"))
+        stop = min(max(stop, start + 1), start + SLICE_CHUNK_TRIANGLES)
+        _slice_block(vectors[start:stop], first[start:stop], counts[start:stop], z_min, layer_height, contours, areas)
+        start = stop
+
+    if areas.sum() < 0:
+        areas = -areas
+    return contours, areas
+
+
+def estimate_from_profile(contours, areas, layer_height, infill):
+    """
+    Print estimate of a sliced model for one infill percentage (FDM only; resin and
+    SLS parts are solid): layer count, FDM path lengths, and per technology the
+    print time in seconds and the material used in cm3.
+    """
+    layers = len(contours)
+    fdm, resin, sls = PROCESS_PROFILES["FDM"], PROCESS_PROFILES["RESIN"], PROCESS_PROFILES["SLS"]
+    solid_cm3 = float(areas.sum()) * layer_height / 1000
+
+    # FDM: walls follow every contour, the area inside them is filled with parallel lines
+    width = fdm["line_width_mm"]
+    perimeter_mm = float(contours.sum()) * fdm["walls"]
+    inner_area = np.maximum(areas - contours * fdm["walls"] * width, 0)
+    fill = np.full(layers, infill / 100)
+    fill[:fdm["solid_layers"]] = 1.0
+    fill[max(layers - fdm["solid_layers"], 0):] = 1.0
+    infill_mm = float((inner_area * fill).sum()) / width
+    fdm_seconds = (perimeter_mm / fdm["perimeter_speed_mm_s"] + infill_mm / fdm["infill_speed_mm_s"]
+                   + layers * fdm["layer_change_s"])
+    fdm_cm3 = (perimeter_mm + infill_mm) * width * layer_height / 1000
+
+    bottom = min(resin["bottom_layers"], layers)
+    resin_seconds = (layers * (resin["exposure_s"] + resin["lift_s"])
+                     + bottom * (resin["bottom_exposure_s"] - resin["exposure_s"]))
+
+    hatch_mm = float(areas.sum()) / sls["hatch_spacing_mm"]
+    sls_seconds = (hatch_mm / sls["scan_speed_mm_s"] + float(contours.sum()) / sls["contour_speed_mm_s"]
+                   + layers * sls["recoat_s"])
+
+    return {
+        "layer_height_mm": layer_height,
+        "infill": int(infill),
+        "layers": layers,
+        "perimeter_mm": round(perimeter_mm, 1),
+        "infill_mm": round(infill_mm, 1),
+        "print_time_s": {"FDM": round(fdm_seconds), "RESIN": round(resin_seconds), "SLS": round(sls_seconds)},
+        "material_cm3": {"FDM": round(fdm_cm3, 3), "RESIN": round(solid_cm3, 3), "SLS": round(solid_cm3, 3)},
+    }
+
+
+def estimate_table(contours, areas, layer_height, infills):
+    """
+    Estimates of a sliced model for several infills, in the compact form they are cached
+    in: the figures every infill shares, plus per infill (under "fdm") the FDM infill
+    path length, print time and material.
+    """
+    estimates = [estimate_from_profile(contours, areas, layer_height, infill) for infill in infills]
+    shared = estimates[0]
+    return {
+        "layer_height_mm": layer_height,
+        "layers": shared["layers"],
+        "perimeter_mm": shared["perimeter_mm"],
+        "print_time_s": {tech: s for tech, s in shared["print_time_s"].items() if tech != "FDM"},
+        "material_cm3": {tech: cm3 for tech, cm3 in shared["material_cm3"].items() if tech != "FDM"},
+        "fdm": {str(e["infill"]): [e["infill_mm"], e["print_time_s"]["FDM"], e["material_cm3"]["FDM"]]
+                for e in estimates},
+    }
+
+
+def table_estimate(table, infill):
+    """The estimate for one infill from an estimate table, or None when it is not in it."""
+    fdm = table["fdm"].get(str(int(infill)))
+    if fdm is None:
+        return None
+    infill_mm, fdm_seconds, fdm_cm3 = fdm
+    return {
+        "layer_height_mm": table["layer_height_mm"],
+        "infill": int(infill),
+        "layers": table["layers"],
+        "perimeter_mm": table["perimeter_mm"],
+        "infill_mm": infill_mm,
+        "print_time_s": {"FDM": fdm_seconds, **table["print_time_s"]},
+        "material_cm3": {"FDM": fdm_cm3, **table["material_cm3"]},
+    }
+
+
+def estimate_stl_path(path, layer_heights, infills):
+    """
+    Estimates an STL file on disk for every layer height and infill, slicing once per
+    layer height. Returns one estimate table per layer height, or a placeholder (see
+    unavailable_estimate) for the layer heights too complex to slice.
+    Picklable entry point for worker processes.
+    """
+    vectors = load_stl_vectors(path)
+    tables = []
+    for layer_height in layer_heights:
+        try:
+            contours, areas = slice_profile(vectors, layer_height)
+        except EstimateUnavailable as e:
+            tables.append(unavailable_estimate(layer_height, e))
+            continue
+        tables.append(estimate_table(contours, areas, layer_height, infills))
+    return tables
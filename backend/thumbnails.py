@@ -0,0 +1,159 @@
+import os
+import struct
+import zlib
+import numpy as np
+
+from previews import decode_preview
+
+# CPU-only thumbnails: the low-poly preview is rasterized with NumPy and saved as PNG.
+THUMBNAIL_SIZE = 160
+THUMBNAIL_SUPERSAMPLING = 2
+THUMBNAIL_MARGIN = 0.08
+DEFAULT_THUMBNAIL_COLOR = "6366f1"
+# Colors a thumbnail can be drawn in: the material palette of the frontend
+# (MATERIAL_COLORS in frontend/src/constants.js) and the default
+THUMBNAIL_COLORS = {
+    DEFAULT_THUMBNAIL_COLOR,
+    "ff8c00", "32cd32", "dc143c", "1e90ff",  # PLA, PETG, ABS, TPU
+    "808080", "00ced1",                      # RESIN_STD, RESIN_TOUGH
+    "e3e3e3", "f9f9f9",                      # NYLON_PA12, NYLON_GLASS
+}
+# Camera looks from the front-right-top corner; the light comes from slightly above it
+VIEW_FROM = np.array([1.0, -1.0, 0.8])
+LIGHT_FROM = np.array([0.4, -1.0, 1.2])
+AMBIENT = 0.35
+# Triangle/pixel candidate pairs tested at once, to bound memory
+RASTER_BATCH = 2_000_000
+
+
+def thumbnail_path(thumbnail_dir, file_hash, color):
+    return os.path.join(thumbnail_dir, f"{file_hash}_{color}.png")
+
+
+def _normalize(v):
+    return v / np.linalg.norm(v)
+
+
+def _rasterize(points, triangles, size):
+    """
+    Z-buffers the projected triangles onto a size x size grid.
+    `points` are (x, y, depth) in pixel units. Returns the index of the visible
+    triangle for every pixel (-1 where nothing is drawn).
+    """
+    depth = np.full(size * size, np.inf)
+    owner = np.full(size * size, -1, dtype=np.int64)
+    if len(triangles) == 0:
+        return owner.reshape(size, size)
+
+    corners = points[triangles]
+    x0 = np.clip(np.floor(corners[:, :, 0].min(axis=1)), 0, size - 1).astype(np.int64)
+    x1 = np.clip(np.ceil(corners[:, :, 0].max(axis=1)), 0, size - 1).astype(np.int64)
+    y0 = np.clip(np.floor(corners[:, :, 1].min(axis=1)), 0, size - 1).astype(np.int64)
+    y1 = np.clip(np.ceil(corners[:, :, 1].max(axis=1)), 0, size - 1).astype(np.int64)
+    widths, heights = x1 - x0 + 1, y1 - y0 + 1
+    counts = widths * heights
+    ends = np.cumsum(counts)
+
+    start = 0
+    while start < len(triangles):
+        # Largest run of triangles whose bounding boxes fit in one batch
+        base = ends[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(ends, base + RASTER_BATCH, side="right")))
+        tri = np.repeat(np.arange(start, stop), counts[start:stop])
+        offsets = np.arange(len(tri)) - np.repeat(ends[start:stop] - counts[start:stop] - base, counts[start:stop])
+        px = x0[tri] + offsets % widths[tri] + 0.5
+        py = y0[tri] + offsets // widths[tri] + 0.5
+
+        a, b, c = corners[tri, 0], corners[tri, 1], corners[tri, 2]
+        area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+        w0 = (b[:, 0] - px) * (c[:, 1] - py) - (b[:, 1] - py) * (c[:, 0] - px)
+        w1 = (c[:, 0] - px) * (a[:, 1] - py) - (c[:, 1] - py) * (a[:, 0] - px)
+        w2 = area - w0 - w1
+        # Winding in STL files is unreliable: accept both orientations
+        sign = np.sign(area)
+        inside = (area != 0) & (w0 * sign >= 0) & (w1 * sign >= 0) & (w2 * sign >= 0)
+
+        tri, area, w0, w1, w2 = tri[inside], area[inside], w0[inside], w1[inside], w2[inside]
+        pixel = (py[inside].astype(np.int64)) * size + px[inside].astype(np.int64)
+        a, b, c = corners[tri, 0, 2], corners[tri, 1, 2], corners[tri, 2, 2]
+        z = (w0 * a + w1 * b + w2 * c) / area
+
+        # Nearest fragment per pixel, then merge with the previous batches
+        order = np.lexsort((z, pixel))
+        pixel, z, tri = pixel[order], z[order], tri[order]
+        first = np.ones(len(pixel), dtype=bool)
+        first[1:] = pixel[1:] != pixel[:-1]
+        pixel, z, tri = pixel[first], z[first], tri[first]
+        closer = z < depth[pixel]
+        depth[pixel[closer]] = z[closer]
+        owner[pixel[closer]] = tri[closer]
+        start = stop
+
+    return owner.reshape(size, size)
+
+
+def render_thumbnail(vertices, triangles, color=DEFAULT_THUMBNAIL_COLOR, size=THUMBNAIL_SIZE):
+    """Returns an RGBA (size, size, 4) uint8 image of the mesh with flat shading on a transparent background."""
+    grid = size * THUMBNAIL_SUPERSAMPLING
+    view = _normalize(-VIEW_FROM)
+    right = _normalize(np.cross(view, [0.0, 0.0, 1.0]))
+    up = np.cross(right, view)
+
+    vertices = np.asarray(vertices, dtype=np.float64)
+    points = np.zeros((len(vertices), 3))
+    if len(vertices):
+        projected = vertices @ np.stack([right, up, view], axis=1)
+        lo, hi = projected[:, :2].min(axis=0), projected[:, :2].max(axis=0)
+        scale = grid * (1 - 2 * THUMBNAIL_MARGIN) / (float((hi - lo).max()) or 1.0)
+        center = (lo + hi) / 2
+        points[:, 0] = (projected[:, 0] - center[0]) * scale + grid / 2
+        points[:, 1] = grid / 2 - (projected[:, 1] - center[1]) * scale
+        points[:, 2] = projected[:, 2]
+
+    triangles = np.asarray(triangles, dtype=np.int64)
+    owner = _rasterize(points, triangles, grid)
+
+    corners = vertices[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    normals /= np.where(lengths > 0, lengths, 1.0)[:, None]
+    shade = AMBIENT + (1 - AMBIENT) * np.abs(normals @ _normalize(LIGHT_FROM))
+    base = np.array([int(color[i:i + 2], 16) for i in (0, 2, 4)], dtype=np.float64)
+
+    drawn = owner >= 0
+    rgba = np.zeros((grid, grid, 4))
+    rgba[drawn, :3] = shade[owner[drawn], None] * base
+    rgba[drawn, 3] = 255
+
+    # Box-filter the supersampled image; colors are averaged over covered samples only
+    k = THUMBNAIL_SUPERSAMPLING
+    blocks = rgba.reshape(size, k, size, k, 4).swapaxes(1, 2).reshape(size, size, k * k, 4)
+    alpha = blocks[..., 3].sum(axis=2)
+    image = np.zeros((size, size, 4))
+    image[..., :3] = (blocks[..., :3] * blocks[..., 3:]).sum(axis=2) / np.maximum(alpha, 1)[..., None]
+    image[..., 3] = alpha / (k * k)
+    return np.rint(image).clip(0, 255).astype(np.uint8)
+
+
+def encode_png(image):
+    """Encodes an RGBA uint8 image as PNG."""
+    height, width = image.shape[:2]
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, -1)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), 9)) + chunk(b"IEND", b""))
+
+
+def build_thumbnail(preview_file, out_path, color=DEFAULT_THUMBNAIL_COLOR):
+    """Renders the preview mesh stored in `preview_file` to a PNG at `out_path` (atomically). Runs in worker processes."""
+    with open(preview_file, "rb") as f:
+        vertices, triangles = decode_preview(f.read())
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_png(render_thumbnail(vertices, triangles, color)))
+    os.replace(tmp_path, out_path)
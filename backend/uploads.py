@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from metadata import atomic_write_json, lock_path, locked
+
+
+class UploadError(Exception):
+    """Invalid operation on an upload session; `status_code` is the HTTP status to answer."""
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class UploadSessions:
+    """
+    Resumable uploads stored under `upload_dir`.
+    Each session has a `<id>.part` file that chunks are appended to in order, and a
+    `<id>.json` state file recording the declared size and the bytes received so far,
+    so a client can query the offset and resume after a dropped connection.
+    Chunks of one session may reach different worker processes, so changes hold an
+    advisory lock on the state file. Each process keeps an incremental SHA-256 with the
+    number of bytes it covers; it is used only when it covers the whole file, and the
+    file is rehashed from disk otherwise.
+    """
+    def __init__(self, upload_dir, max_size, ttl_seconds):
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # upload id -> [hasher, bytes hashed], for the chunks received by this process
+        self._hashers = {}
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def _state_path(self, upload_id):
+        return os.path.join(self.upload_dir, f"{upload_id}.json")
+
+    def part_path(self, upload_id):
+        return os.path.join(self.upload_dir, f"{upload_id}.part")
+
+    @staticmethod
+    def _check_id(upload_id):
+        # Ids are generated by us; anything else cannot name a session file
+        try:
+            return str(uuid.UUID(upload_id))
+        except ValueError:
+            raise UploadError(404, "Upload not found")
+
+    def _save(self, state):
+        state["updated_at"] = time.time()
+        atomic_write_json(self._state_path(state["id"]), state, indent=None)
+
+    def get(self, upload_id):
+        upload_id = self._check_id(upload_id)
+        try:
+            with open(self._state_path(upload_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise UploadError(404, "Upload not found")
+
+    def create(self, filename, size):
+        if size <= 0:
+            raise UploadError(400, "Upload size must be positive")
+        if size > self.max_size:
+            raise UploadError(413, "File too large")
+
+        upload_id = str(uuid.uuid4())
+        state = {
+            "id": upload_id,
+            "filename": os.path.basename(filename),
+            "size": size,
+            "offset": 0,
+            "created_at": time.time(),
+        }
+        open(self.part_path(upload_id), "wb").close()
+        self._hashers[upload_id] = [hashlib.sha256(), 0]
+        self._save(state)
+        return state
+
+    def write_chunk(self, upload_id, offset, data, chunk_sha256=None):
+        """
+        Appends `data` at `offset`, which must equal the bytes already received (409 otherwise,
+        so the client re-syncs from the returned state). When `chunk_sha256` is given the chunk
+        is verified before anything is written.
+        """
+        upload_id = self._check_id(upload_id)
+        with locked(self._state_path(upload_id)):
+            state = self.get(upload_id)
+            if offset != state["offset"]:
+                raise UploadError(409, f"Expected offset {state['offset']}")
+            if offset + len(data) > state["size"]:
+                raise UploadError(400, "Chunk exceeds the declared upload size")
+            if chunk_sha256 and hashlib.sha256(data).hexdigest() != chunk_sha256.lower():
+                raise UploadError(400, "Chunk checksum mismatch")
+
+            with open(self.part_path(upload_id), "r+b") as f:
+                f.seek(offset)
+                f.write(data)
+                f.truncate()
+
+            # A chunk received elsewhere leaves a gap in this process's hash: drop it
+            entry = self._hashers.get(upload_id)
+            if entry is not None and entry[1] == offset:
+                entry[0].update(data)
+                entry[1] += len(data)
+            else:
+                self._hashers.pop(upload_id, None)
+            state["offset"] = offset + len(data)
+            self._save(state)
+            return state
+
+    def complete(self, upload_id):
+        """
+        Checks that every byte arrived and returns (state, sha256 of the whole file).
+        The session stays on disk until `discard` is called.
+        """
+        upload_id = self._check_id(upload_id)
+        with locked(self._state_path(upload_id)):
+            state = self.get(upload_id)
+            if state["offset"] != state["size"]:
+                raise UploadError(409, f"Upload incomplete: {state['offset']}/{state['size']} bytes")
+
+            entry = self._hashers.get(upload_id)
+            if entry is not None and entry[1] == state["size"]:
+                return state, entry[0].hexdigest()
+            hasher = hashlib.sha256()
+            with open(self.part_path(upload_id), "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+            return state, hasher.hexdigest()
+
+    def discard(self, upload_id):
+        """Removes the session state and whatever is left of its part file."""
+        self._hashers.pop(upload_id, None)
+        state_path = self._state_path(upload_id)
+        for path in (self.part_path(upload_id), state_path, lock_path(state_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def collect_garbage(self):
+        """Discards sessions not updated for `ttl_seconds`. Returns how many were removed."""
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.upload_dir):
+            upload_id, ext = os.path.splitext(name)
+            path = os.path.join(self.upload_dir, name)
+            if ext == ".json":
+                try:
+                    with open(path, "r") as f:
+                        updated_at = json.load(f).get("updated_at", 0)
+                except (OSError, ValueError):
+                    updated_at = os.path.getmtime(path)
+            elif ext == ".part" and not os.path.exists(self._state_path(upload_id)):
+                updated_at = os.path.getmtime(path)
+            else:
+                continue
+            if now - updated_at > self.ttl_seconds:
+                self.discard(upload_id)
+                removed += 1
+        return removed
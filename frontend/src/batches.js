@@ -0,0 +1,100 @@
+import { useEffect, useRef, useState } from 'react';
+import { useEvents } from './events';
+
+const API_URL = "https://threed-printing-website-xq1q.onrender.com";
+
+// Fetches one page of batch summaries (newest first); pass the previous page's nextCursor to continue
+export async function fetchBatchPage(cursor = null, limit = 50) {
+  const params = new URLSearchParams({ limit });
+  if (cursor) params.set("cursor", cursor);
+  const res = await fetch(`${API_URL}/admin/batches?${params}`);
+  if (!res.ok) throw new Error(`Batch list failed (${res.status})`);
+  return {
+    batches: await res.json(),
+    nextCursor: res.headers.get("X-Next-Cursor"),
+    syncToken: res.headers.get("X-Sync-Token"),
+  };
+}
+
+// Fetches only the batches updated since syncToken; returns null when nothing changed (304)
+export async function fetchBatchChanges(syncToken, etag = null) {
+  const params = new URLSearchParams({ since: syncToken || "" });
+  const res = await fetch(`${API_URL}/admin/batches?${params}`, {
+    headers: etag ? { "If-None-Match": etag } : {},
+  });
+  if (res.status === 304) return null;
+  if (!res.ok) throw new Error(`Batch sync failed (${res.status})`);
+  return {
+    batches: await res.json(),
+    syncToken: res.headers.get("X-Sync-Token"),
+    etag: res.headers.get("ETag"),
+  };
+}
+
+// Replaces changed batches in place and adds new ones, keeping newest-first order
+export function mergeBatches(current, changed) {
+  const byId = new Map(current.map(b => [b.id, b]));
+  changed.forEach(b => byId.set(b.id, b));
+  return Array.from(byId.values()).sort((a, b) => (a.id < b.id ? 1 : -1));
+}
+
+// Paginated batch history, kept current by syncing changed batches whenever the event feed reports one
+export function useBatchHistory() {
+  const [batches, setBatches] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(true);
+  const sync = useRef({ token: null, etag: null, running: false, again: false });
+
+  const syncChanges = async () => {
+    const state = sync.current;
+    if (state.token === null) return;
+    // Events arriving during a sync trigger one more pass instead of overlapping requests
+    if (state.running) {
+      state.again = true;
+      return;
+    }
+    state.running = true;
+    try {
+      do {
+        state.again = false;
+        const changes = await fetchBatchChanges(state.token, state.etag);
+        if (!changes) continue;
+        state.token = changes.syncToken;
+        state.etag = changes.etag;
+        if (changes.batches.length > 0) setBatches(prev => mergeBatches(prev, changes.batches));
+      } while (state.again);
+    } catch (e) {
+      console.error(e);
+    } finally {
+      state.running = false;
+    }
+  };
+
+  useEffect(() => {
+    fetchBatchPage()
+      .then(page => {
+        setBatches(page.batches);
+        setNextCursor(page.nextCursor);
+        Object.assign(sync.current, { token: page.syncToken, etag: null });
+      })
+      .catch(e => console.error(e))
+      .finally(() => setLoading(false));
+  }, []);
+
+  useEvents(event => {
+    if (event.type.startsWith("batch.") || event.type === "connected") syncChanges();
+  });
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      const page = await fetchBatchPage(nextCursor);
+      setBatches(prev => mergeBatches(prev, page.batches));
+      setNextCursor(page.nextCursor);
+    } catch (e) {
+      console.error(e);
+    }
+  };
+
+  return { batches, loading, hasMore: Boolean(nextCursor), loadMore };
+}
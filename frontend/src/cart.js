@@ -0,0 +1,16 @@
+// Each browser keeps its own cart on the server, identified by a random token
+const STORAGE_KEY = "cartToken";
+
+export function getCartToken() {
+  let token = localStorage.getItem(STORAGE_KEY);
+  if (!token) {
+    token = crypto.randomUUID();
+    localStorage.setItem(STORAGE_KEY, token);
+  }
+  return token;
+}
+
+// Headers for every request reading or changing the cart
+export function cartHeaders(headers = {}) {
+  return { ...headers, "X-Cart-Token": getCartToken() };
+}
@@ -1,10 +1,54 @@
 import React, { Suspense } from 'react';
 import { Canvas, useLoader } from '@react-three/fiber';
+import { BufferAttribute, BufferGeometry, FileLoader, Loader } from 'three';
 import { STLLoader } from 'three/examples/jsm/loaders/STLLoader';
 import { Center, Bounds, Environment } from '@react-three/drei';
 
-function Model({ url, color }) {
-  const geometry = useLoader(STLLoader, url);
+// Decodes the backend's low-poly preview format ("LOD1": quantized vertices + indexed triangles)
+function parsePreview(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== 'LOD1') throw new Error('Not a preview file');
+
+  const indexSize = view.getUint32(4, true);
+  const vertexCount = view.getUint32(8, true);
+  const triangleCount = view.getUint32(12, true);
+  const origin = [0, 1, 2].map(i => view.getFloat32(16 + i * 4, true));
+  const step = [0, 1, 2].map(i => view.getFloat32(28 + i * 4, true));
+
+  const quantized = new Uint16Array(buffer, 40, vertexCount * 3);
+  const positions = new Float32Array(vertexCount * 3);
+  for (let i = 0; i < positions.length; i++) {
+    positions[i] = origin[i % 3] + quantized[i] * step[i % 3];
+  }
+
+  const indexOffset = 40 + Math.ceil((vertexCount * 6) / 4) * 4;
+  const IndexArray = indexSize === 2 ? Uint16Array : Uint32Array;
+  const indices = new IndexArray(buffer, indexOffset, triangleCount * 3);
+
+  const geometry = new BufferGeometry();
+  geometry.setAttribute('position', new BufferAttribute(positions, 3));
+  geometry.setIndex(new BufferAttribute(indices, 1));
+  geometry.computeVertexNormals();
+  return geometry;
+}
+
+class PreviewLoader extends Loader {
+  load(url, onLoad, onProgress, onError) {
+    const loader = new FileLoader(this.manager);
+    loader.setResponseType('arraybuffer');
+    loader.load(url, buffer => {
+      try {
+        onLoad(parsePreview(buffer));
+      } catch (e) {
+        if (onError) onError(e);
+      }
+    }, onProgress, onError);
+  }
+}
+
+function Model({ url, loader, color }) {
+  const geometry = useLoader(loader, url);
   return (
     <mesh geometry={geometry}>
       <meshStandardMaterial color={color} />
@@ -12,15 +56,36 @@ function Model({ url, color }) {
   );
 }
 
-const AutoFitModel = ({ url, color }) => {
+// Renders the full STL when the preview is missing (not generated yet, older models)
+class PreviewFallback extends React.Component {
+  constructor(props) {
+    super(props);
+    this.state = { failed: false };
+  }
+
+  static getDerivedStateFromError() {
+    return { failed: true };
+  }
+
+  render() {
+    return this.state.failed ? this.props.fallback : this.props.children;
+  }
+}
+
+const AutoFitModel = ({ url, previewUrl, color }) => {
+    const fullModel = <Model url={url} loader={STLLoader} color={color} />;
     return (
         <Center>
-            <Model url={url} color={color} />
+            {previewUrl ? (
+                <PreviewFallback fallback={fullModel}>
+                    <Model url={previewUrl} loader={PreviewLoader} color={color} />
+                </PreviewFallback>
+            ) : fullModel}
         </Center>
     );
 }
 
-export default function MiniViewer({ url, color = "#6366f1" }) {
+export default function MiniViewer({ url, previewUrl, color = "#6366f1" }) {
   // Safe fallback if the specific material color isn't found
   const finalColor = color || "#6366f1";
 
@@ -34,10 +99,10 @@ export default function MiniViewer({ url, color = "#6366f1" }) {
         <Environment preset="city" />
         <Suspense fallback={null}>
             <Bounds fit clip observe margin={1.8}>
-                <AutoFitModel url={url} color={finalColor} />
+                <AutoFitModel url={url} previewUrl={previewUrl} color={finalColor} />
             </Bounds>
         </Suspense>
       </Canvas>
     </div>
   );
-}
\ No newline at end of file
+}
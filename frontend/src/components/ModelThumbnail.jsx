@@ -0,0 +1,55 @@
+import React, { useEffect, useState } from 'react';
+import MiniViewer from './MiniViewer';
+
+const API = "https://threed-printing-website-xq1q.onrender.com";
+const MAX_RETRIES = 3;
+const RETRY_DELAY_MS = 5000;
+
+// Server-rendered PNG of a stored model; the interactive 3D view only loads when clicked
+export default function ModelThumbnail({ path, previewUrl, color = "#6366f1" }) {
+  const [open, setOpen] = useState(false);
+  const [attempt, setAttempt] = useState(0);
+  const [failed, setFailed] = useState(false);
+
+  useEffect(() => {
+    setAttempt(0);
+    setFailed(false);
+  }, [path, color]);
+
+  const fileUrl = `${API}/files/${path}`;
+  if (open) {
+    return <MiniViewer url={fileUrl} previewUrl={previewUrl} color={color} />;
+  }
+
+  const hex = (color || "#6366f1").replace('#', '');
+  const src = `${API}/thumbnails/${path}?color=${hex}${attempt ? `&attempt=${attempt}` : ''}`;
+
+  // Thumbnails are rendered on first request; a busy server answers 503, so retry a few times
+  const handleError = () => {
+    if (attempt < MAX_RETRIES) {
+      setTimeout(() => setAttempt(a => a + 1), RETRY_DELAY_MS);
+    } else {
+      setFailed(true);
+    }
+  };
+
+  return (
+    <div
+      onClick={() => setOpen(true)}
+      title="3D"
+      style={{ width: '80px', height: '80px', borderRadius: '8px', overflow: 'hidden', background: '#f1f5f9', border: '1px solid #e2e8f0', cursor: 'pointer' }}
+    >
+      {!failed && (
+        <img
+          src={src}
+          alt=""
+          loading="lazy"
+          width={80}
+          height={80}
+          onError={handleError}
+          style={{ display: 'block', width: '100%', height: '100%' }}
+        />
+      )}
+    </div>
+  );
+}
@@ -0,0 +1,39 @@
+import { useEffect, useRef } from 'react';
+import { getCartToken } from './cart';
+
+const API_URL = "https://threed-printing-website-xq1q.onrender.com";
+
+// One EventSource per tab, shared by every subscriber; the browser reconnects it
+// by itself and the server resumes after the last received event id
+let source = null;
+const listeners = new Set();
+
+function connect() {
+  source = new EventSource(`${API_URL}/events?cart_token=${encodeURIComponent(getCartToken())}`);
+  source.onmessage = (message) => {
+    const event = JSON.parse(message.data);
+    listeners.forEach(listener => listener(event));
+  };
+  // Events missed while disconnected and pruned meanwhile are covered by a resync
+  source.onopen = () => listeners.forEach(listener => listener({ type: "connected" }));
+}
+
+// Calls onEvent({ type, ... }) for cart changes of this browser and for batch changes
+export function subscribeEvents(onEvent) {
+  listeners.add(onEvent);
+  if (!source) connect();
+  return () => {
+    listeners.delete(onEvent);
+    if (listeners.size === 0 && source) {
+      source.close();
+      source = null;
+    }
+  };
+}
+
+// Hook form of subscribeEvents; the latest handler is always used
+export function useEvents(onEvent) {
+  const handler = useRef(onEvent);
+  handler.current = onEvent;
+  useEffect(() => subscribeEvents(event => handler.current(event)), []);
+}
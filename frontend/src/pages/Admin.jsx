@@ -1,33 +1,21 @@
-import React, { useEffect, useState } from 'react';
+import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { TRANSLATIONS } from '../translations';
+import { useBatchHistory } from '../batches';
+import { useEvents } from '../events';
 
 export default function Admin({ lang }) {
   const navigate = useNavigate();
   const t = TRANSLATIONS[lang];
   
   // --- State ---
-  const [batches, setBatches] = useState([]);
+  const { batches, hasMore, loadMore } = useBatchHistory();
   const [selectedBatchId, setSelectedBatchId] = useState(null);
   const [batchData, setBatchData] = useState({ content: "", items: [] });
 
-  useEffect(() => {
-    fetchBatches();
-  }, []);
-
-  const fetchBatches = async () => {
-    try {
-      const res = await fetch("https://threed-printing-website-xq1q.onrender.com/admin/batches");
-      const data = await res.json();
-      setBatches(data);
-    } catch (e) {
-      console.error(e);
-    }
-  };
-
-  const loadBatchDetails = async (batchId) => {
+  const loadBatchDetails = async (batchId, { quiet = false } = {}) => {
     setSelectedBatchId(batchId);
-    setBatchData({ content: "Loading...", items: [] });
+    if (!quiet) setBatchData({ content: "Loading...", items: [] });
     try {
       const res = await fetch(`https://threed-printing-website-xq1q.onrender.com/admin/batch/${batchId}`);
       const data = await res.json();
@@ -37,6 +25,13 @@ export default function Admin({ lang }) {
     }
   };
 
+  // Parts marked done at the factory show up without reloading the page
+  useEvents(event => {
+    if (event.type === "batch.item_status" && event.batch_id === selectedBatchId) {
+      loadBatchDetails(selectedBatchId, { quiet: true });
+    }
+  });
+
   const getStatusColor = (status) => {
     if (status === 'Completed') return '#28a745';
     if (status === 'In Progress') return '#ffc107';
@@ -91,6 +86,11 @@ export default function Admin({ lang }) {
               </li>
             ))}
           </ul>
+          {hasMore && (
+            <button onClick={loadMore} className="btn btn-secondary" style={{ width: '100%' }}>
+              {t.load_more || "Load more"}
+            </button>
+          )}
         </div>
 
         {/* Right Column: Details & Manifest */}
@@ -105,6 +105,9 @@ export default function Admin({ lang }) {
                    {batchData.items.map((item, idx) => (
                      <tr key={idx} style={{ borderBottom: '1px solid #eee' }}>
                        <td style={{ padding: '5px' }}>{item.filename}</td>
+                       <td style={{ padding: '5px', color: '#64748b' }}>
+                         {[...new Set((item.plates || []).map(p => p.plate))].join(', ')}
+                       </td>
                        <td style={{ padding: '5px', textAlign: 'right' }}>
                          {item.status === 'done' ? '✅ Produced' : '⏳ Pending'}
                        </td>
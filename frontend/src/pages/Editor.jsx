@@ -5,10 +5,18 @@ import { OrbitControls, Environment, Bounds, Center, useBounds } from '@react-th
 import { STLLoader } from 'three/examples/jsm/loaders/STLLoader';
 import { TRANSLATIONS } from '../translations';
 import { MATERIAL_COLORS } from '../constants';
+import { resumableUpload, RESUMABLE_THRESHOLD } from '../uploads';
+import { cartHeaders } from '../cart';
 import '../App.css';
 
 const INFILL_PRESETS = [20, 40, 60, 80];
 
+// Estimated print time as "3 h 05 min" (or "12 min")
+function formatDuration(seconds) {
+  const minutes = Math.round(seconds / 60);
+  return minutes >= 60 ? `${Math.floor(minutes / 60)} h ${String(minutes % 60).padStart(2, "0")} min` : `${minutes} min`;
+}
+
 // --- 3D Scene Components ---
 
 function Model({ url, color }) {
@@ -47,7 +55,11 @@ export default function Editor({ lang }) {
   
   // Pricing & Metrics
   const [volume, setVolume] = useState(null);
+  const [shellVolume, setShellVolume] = useState(null);
   const [quote, setQuote] = useState({price: 0, weight: 0 });
+  const [priceMatrix, setPriceMatrix] = useState(null);
+  const [modelHash, setModelHash] = useState(null);
+  const [estimate, setEstimate] = useState(null);
   const [isComputing, setIsComputing] = useState(false);
 
   // --- Derived Options ---
@@ -101,6 +113,10 @@ export default function Editor({ lang }) {
     setFileObject(file);
     setFileUrl(URL.createObjectURL(file));
     setVolume(null);
+    setShellVolume(null);
+    setPriceMatrix(null);
+    setModelHash(null);
+    setEstimate(null);
     setQuote({ price: 0, weight: 0 }); 
     setIsComputing(true);
 
@@ -108,14 +124,39 @@ export default function Editor({ lang }) {
     formData.append("file", file);
 
     try {
+      // Large models use the resumable protocol so a dropped connection does not restart the upload
+      if (file.size > RESUMABLE_THRESHOLD) {
+        const response = await resumableUpload(file);
+        if (response.ok) {
+          const data = await response.json();
+          setShellVolume(data.shell_volume_cm3 ?? null);
+          setVolume(data.volume_cm3);
+          setModelHash(data.sha256);
+        } else {
+          setIsComputing(false);
+        }
+        return;
+      }
+
       // Analyze file on server to get volume
-      const response = await fetch("https://threed-printing-website-xq1q.onrender.com/analyze-file", {
+      let response = await fetch("https://threed-printing-website-xq1q.onrender.com/analyze-file", {
         method: "POST",
         body: formData,
       });
+      // Server analysis queue is full: wait as instructed and retry
+      while (response.status === 503) {
+        const retryAfter = parseInt(response.headers.get("Retry-After") || "5");
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+        response = await fetch("https://threed-printing-website-xq1q.onrender.com/analyze-file", {
+          method: "POST",
+          body: formData,
+        });
+      }
       if (response.ok) {
         const data = await response.json();
+        setShellVolume(data.shell_volume_cm3 ?? null);
         setVolume(data.volume_cm3);
+        setModelHash(data.sha256);
       } else {
         setIsComputing(false);
       }
@@ -125,32 +166,67 @@ export default function Editor({ lang }) {
     }
   };
 
-  // Recalculate price whenever configuration or volume changes
+  // Fetch the full price matrix (every material x infill preset) once per analyzed volume
   useEffect(() => {
-    if (volume !== null) {
-      const fetchPrice = async () => {
-        if (!isComputing) setIsComputing(true); 
-        try {
-          const response = await fetch("https://threed-printing-website-xq1q.onrender.com/calculate-price", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
-              volume_cm3: volume,
-              material: materialKey,
-              infill: parseInt(infill)
-            }),
-          });
-          if (response.ok) {
-            const data = await response.json();
-            setQuote({ price: data.price, weight: data.weight_g });
-          }
-        } catch (err) { console.error(err); } finally { setIsComputing(false); }
-      };
-      // Debounce slightly to prevent rapid firing
-      const timeoutId = setTimeout(fetchPrice, 100);
-      return () => clearTimeout(timeoutId);
+    if (volume === null) return;
+    const fetchMatrix = async () => {
+      setIsComputing(true);
+      try {
+        const response = await fetch("https://threed-printing-website-xq1q.onrender.com/calculate-price/batch", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({
+            volumes_cm3: [volume],
+            shell_volumes_cm3: shellVolume === null ? null : [shellVolume],
+            infills: INFILL_PRESETS,
+          }),
+        });
+        if (response.ok) {
+          setPriceMatrix(await response.json());
+        }
+      } catch (err) { console.error(err); } finally { setIsComputing(false); }
+    };
+    fetchMatrix();
+  }, [volume, shellVolume]);
+
+  // Print time estimate: the server slices the model in the background, so poll
+  // (as told by Retry-After) until it is ready; the quote is refined meanwhile
+  useEffect(() => {
+    if (!modelHash) return;
+    let cancelled = false;
+    let timer = null;
+    setEstimate(null);
+    const poll = async () => {
+      try {
+        const effectiveInfill = techKey === "FDM" ? infill : 100;
+        const response = await fetch(`https://threed-printing-website-xq1q.onrender.com/estimate/${modelHash}?tech=${techKey}&infill=${effectiveInfill}`);
+        if (cancelled) return;
+        if (response.status === 202) {
+          const retryAfter = parseInt(response.headers.get("Retry-After") || "2");
+          timer = setTimeout(poll, retryAfter * 1000);
+        } else if (response.ok) {
+          setEstimate(await response.json());
+        }
+      } catch (err) { console.error(err); }
+    };
+    poll();
+    return () => { cancelled = true; clearTimeout(timer); };
+  }, [modelHash, techKey, infill]);
+
+  // Material and infill changes are looked up locally in the matrix, or in the
+  // estimate once it is ready (its price includes machine time)
+  useEffect(() => {
+    const refined = estimate?.materials[materialKey];
+    if (refined) {
+      setQuote({ price: refined.price, weight: refined.weight_g, printTime: refined.print_time_s });
+      return;
     }
-  }, [volume, materialKey, infill, techKey]);
+    if (!priceMatrix) return;
+    const m = priceMatrix.materials.indexOf(materialKey);
+    const i = priceMatrix.infills.indexOf(parseInt(infill));
+    if (m === -1 || i === -1) return;
+    setQuote({ price: priceMatrix.price[0][m][i], weight: priceMatrix.weight_g[0][m][i] });
+  }, [priceMatrix, estimate, materialKey, infill, techKey]);
 
   const handleSaveToCart = async () => {
     if (!fileObject || !quote.price) return;
@@ -169,10 +245,13 @@ export default function Editor({ lang }) {
     formData.append("config", JSON.stringify(configData));
 
     try {
-      const res = await fetch("https://threed-printing-website-xq1q.onrender.com/cart/add", {
-        method: "POST",
-        body: formData
-      });
+      const res = fileObject.size > RESUMABLE_THRESHOLD
+        ? await resumableUpload(fileObject, configData)
+        : await fetch("https://threed-printing-website-xq1q.onrender.com/cart/add", {
+            method: "POST",
+            headers: cartHeaders(),
+            body: formData
+          });
       if (res.ok) {
         navigate("/dashboard");
       } else {
@@ -242,6 +321,11 @@ export default function Editor({ lang }) {
               {t.weight}: {quote.weight} g | {t.vol}: {Math.round(volume)} cm³
             </div>
           )}
+          {quote.printTime > 0 && (
+            <div style={{ fontSize: '0.85rem', color: '#475569', marginBottom: '15px' }}>
+              {t.print_time}: {formatDuration(quote.printTime)}
+            </div>
+          )}
           
           <button className="btn btn-primary" style={{width: '100%'}} disabled={!quote.price || isComputing} onClick={handleSaveToCart}>
             {t.btn_save}
@@ -1,30 +1,25 @@
-import React, { useEffect, useState } from 'react';
+import React, { useState } from 'react';
 import { TRANSLATIONS } from '../translations';
-import MiniViewer from '../components/MiniViewer';
+import ModelThumbnail from '../components/ModelThumbnail';
 import { MATERIAL_COLORS } from '../constants';
+import { useBatchHistory } from '../batches';
+import { useEvents } from '../events';
 
 export default function History({ lang }) {
   const t = TRANSLATIONS[lang];
-  const [batches, setBatches] = useState([]);
+  const { batches, loading, hasMore, loadMore } = useBatchHistory();
   const [expandedBatch, setExpandedBatch] = useState(null);
   const [batchDetails, setBatchDetails] = useState({});
-  const [loading, setLoading] = useState(true);
 
-  useEffect(() => {
-    fetchHistory();
-  }, []);
-
-  const fetchHistory = async () => {
+  const fetchDetails = async (batchId) => {
     try {
-      const res = await fetch("https://threed-printing-website-xq1q.onrender.com/admin/batches");
+      const res = await fetch(`https://threed-printing-website-xq1q.onrender.com/admin/batch/${batchId}`);
       if (res.ok) {
         const data = await res.json();
-        setBatches(data);
+        setBatchDetails(prev => ({ ...prev, [batchId]: data.items }));
       }
     } catch (e) {
-      console.error(e);
-    } finally {
-      setLoading(false);
+      console.error("Error fetching details", e);
     }
   };
 
@@ -37,19 +32,14 @@ export default function History({ lang }) {
     setExpandedBatch(batchId);
     
     // Fetch details if not already cached
-    if (!batchDetails[batchId]) {
-      try {
-        const res = await fetch(`https://threed-printing-website-xq1q.onrender.com/admin/batch/${batchId}`);
-        if (res.ok) {
-          const data = await res.json();
-          setBatchDetails(prev => ({ ...prev, [batchId]: data.items }));
-        }
-      } catch (e) {
-        console.error("Error fetching details", e);
-      }
-    }
+    if (!batchDetails[batchId]) fetchDetails(batchId);
   };
 
+  // Cached details are refreshed when a part of that batch changes status
+  useEvents(event => {
+    if (event.type === "batch.item_status" && batchDetails[event.batch_id]) fetchDetails(event.batch_id);
+  });
+
   const getStatusStyle = (status) => {
     if (status === 'Completed') return { background: '#dcfce7', color: '#166534', border: '1px solid #bbf7d0' };
     if (status === 'In Progress') return { background: '#fef9c3', color: '#854d0e', border: '1px solid #fde047' };
@@ -115,8 +105,9 @@ export default function History({ lang }) {
                                              background: 'white', padding: '15px', borderRadius: '8px', 
                                              border: '1px solid #e2e8f0' 
                                          }}>
-                                             <MiniViewer 
-                                                url={`https://threed-printing-website-xq1q.onrender.com/files/production/${batch.id}/${item.stl_disk_name}`} 
+                                             <ModelThumbnail 
+                                                path={`production/${batch.id}/${item.stl_disk_name}`} 
+                                                previewUrl={item.sha256 && `https://threed-printing-website-xq1q.onrender.com/previews/${item.sha256}`}
                                                 color={MATERIAL_COLORS[item.config.material]} // PASS COLOR
                                              />
                                              <div style={{ flex: 1 }}>
@@ -145,6 +136,11 @@ export default function History({ lang }) {
           </tbody>
         </table>
       )}
+      {hasMore && (
+        <div className="text-center" style={{ marginTop: '20px' }}>
+          <button className="btn btn-secondary" onClick={loadMore}>{t.load_more}</button>
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
@@ -1,8 +1,10 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { TRANSLATIONS } from '../translations';
-import MiniViewer from '../components/MiniViewer';
+import ModelThumbnail from '../components/ModelThumbnail';
 import { MATERIAL_COLORS } from '../constants';
+import { cartHeaders } from '../cart';
+import { useEvents } from '../events';
 
 export default function Menu({ lang }) {
   const navigate = useNavigate();
@@ -16,7 +18,7 @@ export default function Menu({ lang }) {
 
   const fetchCart = async () => {
     try {
-      const res = await fetch("https://threed-printing-website-xq1q.onrender.com/cart");
+      const res = await fetch("https://threed-printing-website-xq1q.onrender.com/cart", { headers: cartHeaders() });
       const data = await res.json();
       setCart(data);
     } catch (err) {
@@ -24,6 +26,12 @@ export default function Menu({ lang }) {
     }
   };
 
+  // Changes made from another tab with the same cart
+  useEvents(event => {
+    if (event.type === "cart.launched") setCart([]);
+    else if (event.type.startsWith("cart.") || event.type === "connected") fetchCart();
+  });
+
   useEffect(() => {
     const total = cart.reduce((sum, item) => {
       return sum + (item.config.price * item.quantity);
@@ -35,7 +43,7 @@ export default function Menu({ lang }) {
     if (newQty < 1) return;
     await fetch("https://threed-printing-website-xq1q.onrender.com/cart/update-qty", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: cartHeaders({ "Content-Type": "application/json" }),
       body: JSON.stringify({ item_id: id, quantity: newQty })
     });
     fetchCart();
@@ -45,7 +53,7 @@ export default function Menu({ lang }) {
     if(!confirm(t.btn_delete + "?")) return;
     await fetch("https://threed-printing-website-xq1q.onrender.com/cart/delete", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: cartHeaders({ "Content-Type": "application/json" }),
       body: JSON.stringify({ item_id: id, quantity: 0 })
     });
     fetchCart();
@@ -53,7 +61,7 @@ export default function Menu({ lang }) {
 
   const launchProduction = async () => {
     try {
-      const res = await fetch("https://threed-printing-website-xq1q.onrender.com/production/launch", { method: "POST" });
+      const res = await fetch("https://threed-printing-website-xq1q.onrender.com/production/launch", { method: "POST", headers: cartHeaders() });
       if (res.ok) {
         setCart([]); 
         navigate('/success'); 
@@ -63,9 +71,10 @@ export default function Menu({ lang }) {
     }
   };
 
-  const getFileUrl = (item) => {
-      const filename = item.filepath.split(/[/\\]/).pop();
-      return `https://threed-printing-website-xq1q.onrender.com/files/cart/${filename}`;
+  const getFilePath = (item) => {
+      // Models are stored under data/cart/<cart directory>/ (older ones directly in data/cart/)
+      const relative = item.filepath.replace(/\\/g, '/').split('/cart/').pop();
+      return `cart/${relative}`;
   };
 
   return (
@@ -101,8 +110,9 @@ export default function Menu({ lang }) {
                 <tr key={item.id}>
                   <td>
                     <div style={{display:'flex', alignItems:'center', gap:'15px'}}>
-                        <MiniViewer 
-                           url={getFileUrl(item)} 
+                        <ModelThumbnail 
+                           path={getFilePath(item)} 
+                           previewUrl={item.sha256 && `https://threed-printing-website-xq1q.onrender.com/previews/${item.sha256}`}
                            color={MATERIAL_COLORS[item.config.material]} // PASS COLOR
                         />
                         <strong>{item.filename}</strong>
@@ -48,6 +48,7 @@ export const TRANSLATIONS = {
     section_infill: "4. Infill",
     est_cost: "Unit Cost",
     weight: "Weight",
+    print_time: "Print time",
     vol: "Volume",
     calc: "Calculating...",
     btn_save: "Add to Project",
@@ -85,7 +86,8 @@ export const TRANSLATIONS = {
     history_empty: "No past orders found.",
     col_date: "Batch ID / Date",
     col_status: "Status",
-    col_progress: "Progress"
+    col_progress: "Progress",
+    load_more: "Load more"
   },
 
   CN: {
@@ -137,6 +139,7 @@ export const TRANSLATIONS = {
     section_infill: "4. 填充率",
     est_cost: "单价预估",
     weight: "重量",
+    print_time: "打印时间",
     vol: "体积",
     calc: "计算中...",
     btn_save: "添加到项目",
@@ -174,6 +177,7 @@ export const TRANSLATIONS = {
     history_empty: "暂无历史订单。",
     col_date: "日期/批次号",
     col_status: "状态",
-    col_progress: "进度"
+    col_progress: "进度",
+    load_more: "加载更多"
   }
 };
\ No newline at end of file
@@ -0,0 +1,55 @@
+import { cartHeaders } from './cart';
+
+const API_URL = "https://threed-printing-website-xq1q.onrender.com";
+
+// Files above this size go through the resumable upload protocol
+export const RESUMABLE_THRESHOLD = 20 * 1024 * 1024;
+const MAX_RETRIES = 5;
+
+async function sha256Hex(buffer) {
+  const digest = await crypto.subtle.digest("SHA-256", buffer);
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, "0")).join("");
+}
+
+// Uploads `file` chunk by chunk; after a network error it asks the server for the
+// received offset and resumes from there. Resolves with the finalize response.
+export async function resumableUpload(file, config = null) {
+  const initRes = await fetch(`${API_URL}/uploads`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ filename: file.name, size: file.size }),
+  });
+  if (!initRes.ok) throw new Error(`Upload init failed (${initRes.status})`);
+  const { upload_id, chunk_size } = await initRes.json();
+
+  let offset = 0;
+  let retries = 0;
+  while (offset < file.size) {
+    const chunk = await file.slice(offset, offset + chunk_size).arrayBuffer();
+    try {
+      const res = await fetch(`${API_URL}/uploads/${upload_id}?offset=${offset}`, {
+        method: "PUT",
+        headers: { "X-Chunk-Sha256": await sha256Hex(chunk) },
+        body: chunk,
+      });
+      if (!res.ok && res.status !== 409) throw new Error(`Chunk upload failed (${res.status})`);
+      if (res.ok) {
+        offset = (await res.json()).offset;
+        retries = 0;
+        continue;
+      }
+    } catch (e) {
+      if (++retries > MAX_RETRIES) throw e;
+      await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+    }
+    // Re-sync with what the server actually stored
+    const status = await fetch(`${API_URL}/uploads/${upload_id}`);
+    if (status.ok) offset = (await status.json()).offset;
+  }
+
+  return fetch(`${API_URL}/uploads/${upload_id}/finalize`, {
+    method: "POST",
+    headers: cartHeaders({ "Content-Type": "application/json" }),
+    body: JSON.stringify({ config }),
+  });
+}